@@ -0,0 +1,74 @@
+"""
+Memory benchmark for The Dyrt scraper: Pydantic models vs compact records for in-flight campgrounds.
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+
+from loguru import logger
+
+from src.mock_server import synthetic_page
+from src.models.record import CampgroundRecord
+from src.parser import parse_page
+
+PAGE_SIZE = 100
+
+def build(count, compact):
+    """
+    Parse `count` campgrounds page by page, keeping only the parsed representation.
+
+    Args:
+        count: Number of campgrounds to keep
+        compact: Keep CampgroundRecord objects instead of Campground models
+    """
+    kept = []
+    for page in range(-(-count // PAGE_SIZE)):
+        # Round-trip through JSON so strings are separate objects, as in real responses
+        items = json.loads(json.dumps(synthetic_page(min(PAGE_SIZE, count - page * PAGE_SIZE), seed=page)))
+        for n, item in enumerate(items):
+            item["id"] = str(page * PAGE_SIZE + n)
+        camps = parse_page(items)
+        kept.extend(map(CampgroundRecord.from_campground, camps) if compact else camps)
+    return kept
+
+def measure(count, compact):
+    """
+    Return the memory retained by `count` parsed campgrounds, in bytes per record.
+    """
+    gc.collect()
+    tracemalloc.start()
+    kept = build(count, compact)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(kept) == count
+    del kept
+    return retained / count
+
+def run_benchmark(sizes):
+    """
+    Report bytes per record for both representations at each size.
+
+    Args:
+        sizes: Record counts to measure
+    """
+    logger.remove()  # keep validation warnings out of the report
+    print(f"{'Records':>10} {'Campground':>14} {'CampgroundRecord':>18} {'Saved':>8}")
+    for size in sizes:
+        model = measure(size, compact=False)
+        record = measure(size, compact=True)
+        print(f"{size:>10,} {model:>12,.0f} B {record:>16,.0f} B {1 - record / model:>7.0%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the memory used by in-flight campgrounds")
+    parser.add_argument("--sizes", default="50000,500000", help="Comma-separated record counts to measure")
+
+    args = parser.parse_args()
+
+    try:
+        run_benchmark([int(size) for size in args.sizes.split(",")])
+    except KeyboardInterrupt:
+        print("\nBenchmark interrupted by user")
+        sys.exit(0)
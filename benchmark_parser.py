@@ -0,0 +1,123 @@
+"""
+Parser benchmark for The Dyrt scraper: legacy per-item parsing vs the fast-path page parser.
+"""
+import argparse
+import json
+import sys
+import time
+
+from dateutil.parser import parse as parse_date
+from loguru import logger
+from pydantic import ValidationError
+
+from src.mock_server import synthetic_page
+from src.models.campground import Campground
+from src.parser import parse_page
+
+def legacy_parse_item(item):
+    """
+    The per-item parser the scraper used before the fast path, without geocoding.
+    """
+    attrs = item.get("attributes", {})
+    availability_updated_at = None
+    if attrs.get("availability-updated-at"):
+        try:
+            availability_updated_at = parse_date(attrs["availability-updated-at"])
+        except Exception as e:
+            logger.warning(f"⛔ Failed to parse date: {e}")
+
+    address_parts = [
+        attrs.get("name"),
+        attrs.get("administrative-area"),
+        attrs.get("nearest-city-name"),
+        attrs.get("region-name")
+    ]
+    address = ", ".join(p for p in address_parts if p)
+
+    data = {
+        "id": item.get("id"),
+        "type": item.get("type"),
+        "links": {"self": item.get("links", {}).get("self")},
+        "name": attrs.get("name"),
+        "latitude": attrs.get("latitude"),
+        "longitude": attrs.get("longitude"),
+        "region-name": attrs.get("region-name") or "Unknown",
+        "administrative-area": attrs.get("administrative-area"),
+        "nearest-city-name": attrs.get("nearest-city-name"),
+        "accommodation-type-names": attrs.get("accommodation-type-names", []),
+        "bookable": attrs.get("bookable", False),
+        "camper-types": attrs.get("camper-types", []),
+        "operator": attrs.get("operator"),
+        "photo-url": attrs.get("photo-url"),
+        "photo-urls": attrs.get("photo-urls", []),
+        "photos-count": attrs.get("photos-count", 0),
+        "rating": attrs.get("rating"),
+        "reviews-count": attrs.get("reviews-count", 0),
+        "slug": attrs.get("slug"),
+        "price-low": float(attrs["price-low"]) if attrs.get("price-low") else None,
+        "price-high": float(attrs["price-high"]) if attrs.get("price-high") else None,
+        "availability-updated-at": availability_updated_at,
+    }
+
+    try:
+        camp = Campground.model_validate(data)
+        camp.__dict__["address"] = address
+        return camp
+    except ValidationError as ve:
+        logger.warning(f"❌ Validation failed {data['id']}: {ve}")
+        return None
+
+def legacy_parse_page(items):
+    return [camp for camp in map(legacy_parse_item, items) if camp is not None]
+
+def measure(parse, items, repeat):
+    """
+    Parse the page `repeat` times and return the throughput in items per second.
+    """
+    parse(items)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse(items)
+    return len(items) * repeat / (time.perf_counter() - started)
+
+def run_benchmark(page_path=None, size=100, repeat=200):
+    """
+    Compare the legacy and fast-path parsers on one page.
+
+    Args:
+        page_path: Recorded search-results response to parse; a synthetic page is used if omitted
+        size: Number of items on the synthetic page
+        repeat: How many times each parser parses the page
+    """
+    if page_path:
+        with open(page_path) as f:
+            items = json.load(f).get("data", [])
+        print(f"Parsing recorded page {page_path} ({len(items)} items)")
+    else:
+        items = synthetic_page(size)
+        print(f"Parsing synthetic page ({len(items)} items)")
+
+    legacy = [camp.model_dump() for camp in legacy_parse_page(items)]
+    fast = [camp.model_dump() for camp in parse_page(items)]
+    if legacy != fast:
+        print("Warning: the parsers disagree on this page")
+
+    before = measure(legacy_parse_page, items, repeat)
+    after = measure(parse_page, items, repeat)
+    print(f"Legacy parser:    {before:>10,.0f} items/sec")
+    print(f"Fast-path parser: {after:>10,.0f} items/sec")
+    print(f"Speedup:          {after / before:>10.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark The Dyrt search-results parser")
+    parser.add_argument("--page", help="Recorded search-results JSON response to parse")
+    parser.add_argument("--size", type=int, default=100, help="Items on the synthetic page")
+    parser.add_argument("--repeat", type=int, default=200, help="Times each parser parses the page")
+
+    args = parser.parse_args()
+
+    try:
+        run_benchmark(page_path=args.page, size=args.size, repeat=args.repeat)
+    except KeyboardInterrupt:
+        print("\nBenchmark interrupted by user")
+        sys.exit(0)
@@ -0,0 +1,203 @@
+"""
+End-to-end benchmark for The Dyrt scraper: DyrtScraper.run against the local mock search API.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from loguru import logger
+
+from src.mock_server import start_process
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_DIR = "benchmarks"
+
+def git_revision():
+    """
+    Return the current commit and whether the work tree has uncommitted changes, if this is a git checkout.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def start_mock_server(count, skew, latency_ms, seed):
+    """
+    Start the mock search API with a synthetic dataset in its own process and wait until it answers.
+
+    Args:
+        count: Number of synthetic campgrounds
+        skew: Share of campgrounds packed into dense hotspots
+        latency_ms: Latency the server adds to every response
+        seed: Seed of the synthetic dataset
+
+    Returns:
+        The server process and its search URL
+    """
+    return start_process("--count", str(count), "--hotspot-share", str(skew),
+                         "--latency-ms", str(latency_ms), "--seed", str(seed))
+
+def run_once(url, settings):
+    """
+    Scrape the mock server once and return the measurements.
+
+    Runs in a fresh child process for every dataset, so that peak RSS is per run.
+    """
+    from sqlalchemy import text
+
+    from src.database import engine, init_db
+    from src.rate_control import AdaptiveRateController
+    from src.scraper import DyrtScraper
+
+    logger.remove()
+    logger.add(sys.stderr, level=settings["log_level"])
+    init_db()
+    if settings["fresh"]:
+        with engine.begin() as conn:
+            conn.execute(text("TRUNCATE campgrounds, geocode_queue"))
+
+    rate = settings["rate"]
+    scraper = DyrtScraper(
+        max_in_flight=settings["max_in_flight"],
+        parse_workers=settings["parse_workers"],
+        search_url=url,
+        rate_controller=AdaptiveRateController(initial_rate=rate, max_rate=rate, min_rate=min(rate, 1.0)),
+    )
+    started = time.perf_counter()
+    scraper.run(batch_size=settings["batch_size"], write_mode=settings["write_mode"])
+    seconds = time.perf_counter() - started
+
+    pages = scraper.rate_controller.snapshot()["requests"]
+    items = sum(scraper.write_stats.get(key, 0) for key in ("inserted", "changed", "unchanged"))
+    peak_rss = peak_parser_rss = None
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        if settings["parse_workers"]:
+            # The largest child process, i.e. the busiest parser worker
+            peak_parser_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {
+        "seconds": round(seconds, 3),
+        "pages": pages,
+        "items": items,
+        "pages_per_sec": round(pages / seconds, 1),
+        "items_per_sec": round(items / seconds, 1),
+        "peak_rss_mb": peak_rss and round(peak_rss, 1),
+        "peak_parser_rss_mb": peak_parser_rss and round(peak_parser_rss, 1),
+        "db_write_seconds": round(scraper.stage_seconds["save"], 3),
+        "stage_seconds": {stage: round(value, 3) for stage, value in scraper.stage_seconds.items()},
+        "writes": scraper.write_stats,
+        "duplicates": scraper.dedup_stats,
+    }
+
+def run_benchmark(sizes, settings, output=None, baseline=None):
+    """
+    Benchmark a full scrape of a synthetic dataset of each size and store the results as JSON.
+
+    Args:
+        sizes: Numbers of synthetic campgrounds to scrape
+        settings: Scraper and mock server settings
+        output: Result file (default: benchmarks/scraper-<commit>-<time>.json)
+        baseline: Earlier result file to compare items/sec with
+    """
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "settings": settings,
+        "runs": [],
+    }
+    for size in sizes:
+        print(f"Scraping {size:,} synthetic campgrounds...")
+        server, url = start_mock_server(size, settings["skew"], settings["latency_ms"], settings["seed"])
+        try:
+            child = subprocess.run(
+                [sys.executable, __file__, "--run-one", url, "--settings", json.dumps(settings)],
+                stdout=subprocess.PIPE, check=True, text=True,
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        result = {"campgrounds": size, **json.loads(child.stdout.strip().splitlines()[-1])}
+        if result["items"] < size:
+            print(f"Warning: only {result['items']:,} of {size:,} campgrounds were saved")
+        report["runs"].append(result)
+
+    print(f"\n{'Campgrounds':>11} {'Pages/s':>9} {'Items/s':>10} {'Peak RSS':>10} {'DB write':>9}  Stage seconds")
+    for run in report["runs"]:
+        rss = f"{run['peak_rss_mb']:,.0f} MB" if run["peak_rss_mb"] else "n/a"
+        stages = ", ".join(f"{stage} {value:.1f}" for stage, value in run["stage_seconds"].items())
+        print(f"{run['campgrounds']:>11,} {run['pages_per_sec']:>9,.1f} {run['items_per_sec']:>10,.0f} {rss:>10} "
+              f"{run['db_write_seconds']:>8.1f}s  {stages}")
+
+    if baseline:
+        with open(baseline) as f:
+            before = {run["campgrounds"]: run for run in json.load(f)["runs"]}
+        print(f"\nCompared with {baseline}:")
+        for run in report["runs"]:
+            if run["campgrounds"] in before:
+                ratio = run["items_per_sec"] / before[run["campgrounds"]]["items_per_sec"]
+                print(f"{run['campgrounds']:>11,} {ratio:>9.2f}x items/sec")
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"scraper-{commit or 'nogit'}-{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark a full scrape against the local mock search API")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated numbers of synthetic campgrounds, e.g. 10000,100000,1000000")
+    parser.add_argument("--skew", type=float, default=0.5, help="Share of campgrounds packed into dense hotspots (0 spreads them evenly)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic datasets")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency the mock server adds to every response")
+    parser.add_argument("--rate", type=float, default=1000, help="Fixed request rate of the scraper, in requests per second")
+    parser.add_argument("--max-in-flight", type=int, default=16, help="Maximum number of concurrent requests")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Number of parser processes (0 parses in the scraper process)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Number of campgrounds written to the database per batch")
+    parser.add_argument("--write-mode", choices=("upsert", "copy"), default="upsert", help="Database write path")
+    parser.add_argument("--fresh", action="store_true", help="Empty the campgrounds table before each run (use a scratch database)")
+    parser.add_argument("--log-level", default="WARNING", help="Scraper log level during the runs")
+    parser.add_argument("--output", help="Result file (default: benchmarks/scraper-<commit>-<time>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare items/sec with")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--settings", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_once(args.run_one, json.loads(args.settings))))
+        sys.exit(0)
+
+    settings = {
+        "skew": args.skew,
+        "seed": args.seed,
+        "latency_ms": args.latency_ms,
+        "rate": args.rate,
+        "max_in_flight": args.max_in_flight,
+        "parse_workers": args.parse_workers,
+        "batch_size": args.batch_size,
+        "write_mode": args.write_mode,
+        "fresh": args.fresh,
+        "log_level": args.log_level,
+    }
+    try:
+        run_benchmark([int(size) for size in args.sizes.split(",")], settings, output=args.output, baseline=args.baseline)
+    except KeyboardInterrupt:
+        print("\nBenchmark interrupted by user")
+        sys.exit(0)
@@ -16,29 +16,58 @@ from loguru import logger
 
 from src.api import app
 from src.database import init_db
+from src.geocode_backfill import GeocodeBackfill
 from src.logger import setup_logger
 from src.scheduler import ScraperScheduler
-from src.scraper import DyrtScraper
+from src.scraper import WRITE_MODES, DyrtScraper
 
-def run_scraper():
+def run_scraper(max_in_flight=16, batch_size=500, write_mode="upsert", resume=False, worker=False, run_id=None,
+                parse_workers=0, search_url=None, record_dir=None, profile=False):
     """
     Run the scraper once.
+    
+    Args:
+        max_in_flight: Maximum number of concurrent requests to The Dyrt
+        batch_size: Number of campgrounds written to the database per batch
+        write_mode: "upsert" for batched upserts, "copy" for a COPY-based bulk load
+        resume: Continue the latest unfinished run instead of starting a new one
+        worker: Join the running scrape run shared with other scraper processes, starting one if there is none
+        run_id: ID of the scrape run to join as a worker
+        parse_workers: Number of processes decoding and validating result pages (0 parses in-process)
+        search_url: Search endpoint to scrape instead of The Dyrt's, e.g. the mock server
+        record_dir: Directory to save every raw search response to, for replaying with the mock server
+        profile: Profile the run with cProfile, writing the stats to logs/
     """
     logger.info("Running scraper")
-    scraper = DyrtScraper()
-    scraper.run()
+    scraper = DyrtScraper(max_in_flight=max_in_flight, parse_workers=parse_workers, search_url=search_url,
+                          record_dir=record_dir)
+    scraper.run(batch_size=batch_size, write_mode=write_mode, resume=resume, worker=worker, run_id=run_id,
+                profile=profile)
     logger.info("Scraper completed")
 
-def run_scheduler(interval=24):
+def run_geocode_backfill(limit=None):
+    """
+    Fill in the addresses of campgrounds queued for reverse geocoding.
+    
+    Args:
+        limit: Maximum number of queued campgrounds to geocode (default: drain the queue)
+    """
+    logger.info("Running geocoding backfill")
+    GeocodeBackfill().run(limit=limit)
+    logger.info("Geocoding backfill completed")
+
+def run_scheduler(interval=24, profile=False):
     """
     Run the scheduler with the specified interval.
     
     Args:
         interval: Interval in hours
+        profile: Profile every scheduled scraper run with cProfile, writing the stats to logs/
     """
     logger.info(f"Starting scheduler with {interval} hour interval")
-    scheduler = ScraperScheduler()
+    scheduler = ScraperScheduler(profile=profile)
     scheduler.schedule_interval(hours=interval)
+    scheduler.schedule_geocode_backfill()
     scheduler.run_forever()
 
 def run_api(host="0.0.0.0", port=8000):
@@ -59,9 +88,21 @@ if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="The Dyrt campground scraper")
     parser.add_argument("--scrape", action="store_true", help="Run the scraper once")
+    parser.add_argument("--geocode", action="store_true", help="Geocode the campgrounds queued without an address, then exit")
+    parser.add_argument("--geocode-limit", type=int, help="Maximum number of queued campgrounds to geocode")
     parser.add_argument("--schedule", type=float, default=0, help="Run the scheduler with the specified interval in hours")
     parser.add_argument("--api", action="store_true", help="Run the API server")
     parser.add_argument("--port", type=int, default=8000, help="Port for the API server")
+    parser.add_argument("--max-in-flight", type=int, default=16, help="Maximum number of concurrent requests while scraping")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Number of processes parsing result pages while scraping (0 parses in the scraper process)")
+    parser.add_argument("--search-url", help="Search endpoint to scrape (default: DYRT_SEARCH_URL or The Dyrt's own)")
+    parser.add_argument("--record", metavar="DIR", help="Save every raw search response to DIR, for replay by src.mock_server")
+    parser.add_argument("--profile", action="store_true", help="Profile scraper runs with cProfile and write the stats to logs/")
+    parser.add_argument("--batch-size", type=int, default=500, help="Number of campgrounds written to the database per batch")
+    parser.add_argument("--resume", action="store_true", help="Resume the latest unfinished scrape run from its checkpoints")
+    parser.add_argument("--worker", action="store_true", help="Pull tiles from the shared scrape run until it is drained, together with other scraper processes")
+    parser.add_argument("--run-id", type=int, help="Scrape run to join as a worker (default: the latest running one)")
+    parser.add_argument("--write-mode", choices=WRITE_MODES, default="upsert", help="Database write path: batched upserts, or COPY into a staging table for full refreshes")
     
     args = parser.parse_args()
     
@@ -70,16 +111,31 @@ if __name__ == "__main__":
         init_db()
         
         # Run the requested mode
-        if args.scrape:
-            run_scraper()
+        if args.scrape or args.resume or args.worker:
+            run_scraper(
+                max_in_flight=args.max_in_flight,
+                batch_size=args.batch_size,
+                write_mode=args.write_mode,
+                resume=args.resume,
+                worker=args.worker,
+                run_id=args.run_id,
+                parse_workers=args.parse_workers,
+                search_url=args.search_url,
+                record_dir=args.record,
+                profile=args.profile,
+            )
+        elif args.geocode:
+            run_geocode_backfill(limit=args.geocode_limit)
         elif args.schedule > 0:
-            run_scheduler(interval=args.schedule)
+            run_scheduler(interval=args.schedule, profile=args.profile)
         elif args.api:
             run_api(port=args.port)
         else:
             # Default: run the scraper once
             logger.info("No mode specified, running scraper once")
-            run_scraper()
+            run_scraper(max_in_flight=args.max_in_flight, batch_size=args.batch_size, write_mode=args.write_mode,
+                        parse_workers=args.parse_workers, search_url=args.search_url, record_dir=args.record,
+                        profile=args.profile)
             
     except KeyboardInterrupt:
         logger.info("Interrupted by user")
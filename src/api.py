@@ -3,16 +3,24 @@ API module for controlling the scraper.
 This is a bonus feature.
 """
 import asyncio
-from datetime import datetime
-from typing import Dict, List
+import base64
+import binascii
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Query, Request, Response
 from loguru import logger
 from pydantic import BaseModel
+from sqlalchemy import event, func
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 
-from src.database import CampgroundORM, get_db
+from src.database import CampgroundORM, ScrapeRunORM, SessionLocal, db_session, engine
+from src.metrics import Histogram, PrometheusWriter
 from src.scraper import DyrtScraper
+from src.spatial import campgrounds_in_box, campgrounds_near, parse_bbox
 
 # Create FastAPI app
 app = FastAPI(
@@ -26,8 +34,9 @@ class ScraperStatus(BaseModel):
     Model for scraper status response.
     """
     status: str
-    last_run: str = None
-    message: str = None
+    last_run: Optional[str] = None
+    message: Optional[str] = None
+    circuit_breaker: Optional[Dict] = None
 
 class CampgroundResponse(BaseModel):
     """
@@ -38,9 +47,15 @@ class CampgroundResponse(BaseModel):
     latitude: float
     longitude: float
     region_name: str
-    rating: float = None
-    reviews_count: int = 0
-    address: str = None
+    rating: Optional[float] = None
+    reviews_count: Optional[int] = 0
+    address: Optional[str] = None
+
+class CampgroundDistanceResponse(CampgroundResponse):
+    """
+    Model for campground response with its distance from the searched point.
+    """
+    distance_km: float
 
 # Store the last run time
 last_run_time = None
@@ -48,6 +63,35 @@ last_run_time = None
 # Create scraper instance
 scraper = DyrtScraper()
 
+# Request latency per (method, route), responses per (method, route, status) and pool checkouts
+http_latency: Dict[Tuple[str, str], Histogram] = {}
+http_responses: Dict[Tuple[str, str, str], int] = {}
+pool_checkouts = 0
+
+@event.listens_for(engine, "checkout")
+def count_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    global pool_checkouts
+    pool_checkouts += 1
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Time every request, labelled by its route template rather than its raw path.
+    """
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        key = (request.method, route.path if route is not None else "unmatched")
+        if key not in http_latency:
+            http_latency[key] = Histogram()
+        http_latency[key].observe(time.perf_counter() - started)
+        http_responses[key + (str(status),)] = http_responses.get(key + (str(status),), 0) + 1
+
 async def run_scraper_async():
     """
     Run the scraper asynchronously.
@@ -76,6 +120,11 @@ async def start_scraper(background_tasks: BackgroundTasks):
     """
     Start the scraper in the background.
     """
+    if scraper.running:
+        return {
+            "status": "running",
+            "message": "A scrape is already running",
+        }
     try:
         background_tasks.add_task(run_scraper_async)
         return {
@@ -89,47 +138,205 @@ async def start_scraper(background_tasks: BackgroundTasks):
 @app.get("/status", response_model=ScraperStatus)
 async def get_status():
     """
-    Get the status of the scraper.
+    Get the status of the scraper, including the state of its circuit breaker.
     """
+    if scraper.running:
+        status, message = "running", "A scrape is running"
+    else:
+        status, message = "idle", "Scraper is idle"
     return {
-        "status": "idle",
+        "status": status,
         "last_run": last_run_time,
-        "message": "Scraper is idle",
+        "message": message,
+        "circuit_breaker": scraper.breaker.snapshot(),
     }
 
+def _scrape_run_metrics(writer: PrometheusWriter) -> None:
+    """
+    Add metrics of the scrape runs recorded in the database, by any scraper process.
+    """
+    with SessionLocal() as db:
+        last_success = (
+            db.query(func.max(ScrapeRunORM.finished_at)).filter(ScrapeRunORM.status == "completed").scalar()
+        )
+        last_run = (
+            db.query(ScrapeRunORM).filter(ScrapeRunORM.finished_at.is_not(None))
+            .order_by(ScrapeRunORM.finished_at.desc()).first()
+        )
+        running = db.query(ScrapeRunORM).filter(ScrapeRunORM.status == "running").count()
+        campgrounds = db.query(func.count(CampgroundORM.id)).scalar()
+    if last_success is not None:
+        # Run timestamps are stored as naive UTC
+        writer.gauge("scrape_last_success_timestamp_seconds", "End of the last completed scrape run",
+                     [({}, last_success.replace(tzinfo=timezone.utc).timestamp())])
+    if last_run is not None:
+        writer.gauge("scrape_last_run_duration_seconds", "Wall time of the last finished scrape run, across all workers",
+                     [({"status": last_run.status}, (last_run.finished_at - last_run.started_at).total_seconds())])
+    writer.gauge("scrape_runs_running", "Scrape runs that are still running", [({}, running)])
+    writer.gauge("campgrounds", "Campgrounds stored in the database", [({}, campgrounds)])
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Operational metrics in the Prometheus text format.
+    """
+    writer = PrometheusWriter(prefix="dyrt_")
+    writer.histogram("http_request_duration_seconds", "API request latency by route",
+                     [({"method": method, "route": route}, histogram)
+                      for (method, route), histogram in http_latency.items()])
+    writer.counter("http_responses_total", "API responses by route and status code",
+                   [({"method": method, "route": route, "status": status}, count)
+                    for (method, route, status), count in http_responses.items()])
+
+    writer.counter("db_pool_checkouts_total", "Connections checked out of the database pool", [({}, pool_checkouts)])
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        writer.gauge("db_pool_size", "Configured size of the database pool", [({}, pool.size())])
+        writer.gauge("db_pool_checked_out", "Connections currently checked out of the pool", [({}, pool.checkedout())])
+        # overflow() counts down from -pool_size while the pool fills up, so only positive values are overflow
+        writer.gauge("db_pool_overflow", "Connections open beyond the pool size", [({}, max(pool.overflow(), 0))])
+
+    writer.counter("scraper_runs_total", "Scraper runs started by this API, by outcome",
+                   [({"outcome": outcome}, count) for outcome, count in scraper.run_outcomes.items()])
+    if scraper.last_run_seconds is not None:
+        writer.gauge("scraper_run_duration_seconds", "Duration of the last scraper run started by this API",
+                     [({}, scraper.last_run_seconds)])
+    if scraper.last_success_at is not None:
+        writer.gauge("scraper_last_success_timestamp_seconds", "End of the last completed run started by this API",
+                     [({}, scraper.last_success_at.timestamp())])
+    writer.counter("scraper_campgrounds_total", "Campgrounds written by this API's scraper, by result",
+                   [({"result": result}, count) for result, count in scraper.campgrounds_written.items()])
+    writer.counter("scraper_upstream_errors_total", "Failed requests to The Dyrt by this API's scraper, by status or kind",
+                   [({"kind": kind}, count) for kind, count in scraper.upstream_errors.items()])
+    writer.gauge("scraper_circuit_breaker_state", "Circuit breaker state of this API's scraper (1 for the current state)",
+                 [({"state": state}, int(scraper.breaker.state == state)) for state in ("closed", "open", "half_open")])
+
+    try:
+        await asyncio.to_thread(_scrape_run_metrics, writer)
+        db_up = 1
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read scrape run metrics: {e}")
+        db_up = 0
+    writer.gauge("db_up", "Whether the database could be queried for this scrape of the metrics", [({}, db_up)])
+    return Response(writer.render(), media_type=PrometheusWriter.CONTENT_TYPE)
+
+# Columns of the campground list, loaded without the rest of each row
+LIST_COLUMNS = (
+    CampgroundORM.id,
+    CampgroundORM.name,
+    CampgroundORM.latitude,
+    CampgroundORM.longitude,
+    CampgroundORM.region_name,
+    CampgroundORM.rating,
+    CampgroundORM.reviews_count,
+    CampgroundORM.address,
+)
+
+def encode_cursor(last_id: str) -> str:
+    """
+    Opaque cursor pointing after the campground `last_id`.
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": last_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    """
+    The campground id a cursor points after.
+
+    Raises:
+        ValueError: The cursor wasn't issued by this API
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after = data["after"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(after, str):
+        raise ValueError("Invalid cursor")
+    return after
+
 @app.get("/campgrounds", response_model=List[CampgroundResponse])
 async def get_campgrounds(
-    limit: int = 100,
-    offset: int = 0,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    db: Session = Depends(db_session),
 ):
     """
-    Get campgrounds from the database.
+    Get campgrounds from the database, ordered by id.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page; it is missing on the last page. With a cursor, a page is read
+    straight from the primary key index, so deep pages cost the same as the
+    first one. `offset` still works, but makes the database skip that many rows.
     """
+    if cursor is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset, not both")
     try:
-        campgrounds = db.query(CampgroundORM).offset(offset).limit(limit).all()
+        query = db.query(*LIST_COLUMNS).order_by(CampgroundORM.id)
+        if cursor is not None:
+            query = query.filter(CampgroundORM.id > decode_cursor(cursor))
+        elif offset:
+            query = query.offset(offset)
+        # One extra row tells whether there is a next page
+        campgrounds = query.limit(limit + 1).all()
+        if len(campgrounds) > limit:
+            campgrounds = campgrounds[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(campgrounds[-1].id)
         
-        return [
-            {
-                "id": c.id,
-                "name": c.name,
-                "latitude": c.latitude,
-                "longitude": c.longitude,
-                "region_name": c.region_name,
-                "rating": c.rating,
-                "reviews_count": c.reviews_count,
-                "address": c.address,
-            }
-            for c in campgrounds
-        ]
+        return [c._asdict() for c in campgrounds]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting campgrounds: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/campgrounds/search", response_model=List[CampgroundResponse])
+async def search_campgrounds(
+    bbox: str,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(db_session),
+):
+    """
+    Get campgrounds inside a bounding box, nearest to its center first.
+
+    `bbox` is "west,south,east,north" in degrees, like The Dyrt's own search.
+    """
+    try:
+        box = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return [c._asdict() for c in campgrounds_in_box(db, LIST_COLUMNS, box, limit)]
+    except Exception as e:
+        logger.error(f"Error searching campgrounds: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/campgrounds/near", response_model=List[CampgroundDistanceResponse])
+async def get_campgrounds_near(
+    lat: float,
+    lon: float,
+    radius_km: float = 50.0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(db_session),
+):
+    """
+    Get campgrounds within `radius_km` of a point, nearest first.
+    """
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="lat must be within [-90, 90] and lon within [-180, 180]")
+    if radius_km <= 0:
+        raise HTTPException(status_code=400, detail="radius_km must be positive")
+    try:
+        return [c._asdict() for c in campgrounds_near(db, LIST_COLUMNS, lat, lon, radius_km, limit)]
+    except Exception as e:
+        logger.error(f"Error searching campgrounds near ({lat}, {lon}): {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/campgrounds/{campground_id}", response_model=Dict)
 async def get_campground(
     campground_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(db_session),
 ):
     """
     Get a specific campground from the database.
@@ -0,0 +1,337 @@
+"""
+Durable per-run checkpoints and the Postgres-backed tile queue built on them.
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import and_, literal_column, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from src.database import ScrapeRunORM, ScrapeTileORM, SessionLocal
+from src.tiling import Tile
+
+# Serializes run creation between scraper processes joining the same run
+RUN_LOCK_ID = 727400101
+
+LEASED_STATUSES = ("leased", "fetched")
+OPEN_STATUSES = ("pending",) + LEASED_STATUSES
+
+# Current UTC time on the database server, so leases don't depend on worker clocks
+DB_NOW = literal_column("timezone('utc', now())")
+
+
+def _lease_expiry(lease_seconds: float):
+    return literal_column(f"timezone('utc', now()) + interval '{float(lease_seconds)} seconds'")
+
+
+class CheckpointStore:
+    """
+    Records the tiles of a scrape run and hands them out to scraper workers.
+
+    A tile is `pending` until a worker claims it, `leased` while the worker
+    scrapes it, `fetched` while its campgrounds wait in the worker's write
+    buffer and `done` once they are committed to the database. Tiles that
+    were too dense are marked `split` in the same transaction that adds their
+    children, so the pending, leased and fetched tiles of a run are always
+    exactly the work that remains. Leases cover both leased and fetched tiles
+    and expire, so tiles held by a worker that died are claimed again by the
+    others. A tile that failed goes back to `pending` with a `retry_at` time
+    and is only claimed again after fresh tiles, once that time has passed.
+    """
+
+    def __init__(self, run_id: int):
+        self.run_id = run_id
+
+    @classmethod
+    def start(cls, tiles: Iterable[Tile]) -> "CheckpointStore":
+        """
+        Create a new run seeded with the given tiles.
+        """
+        with SessionLocal() as db:
+            store = cls._create(db, tiles)
+            db.commit()
+        logger.info(f"🆕 Started scrape run {store.run_id}")
+        return store
+
+    @classmethod
+    def _create(cls, db, tiles: Iterable[Tile]) -> "CheckpointStore":
+        run = ScrapeRunORM(status="running")
+        db.add(run)
+        db.flush()
+        store = cls(run.id)
+        store._add_tiles(db, tiles)
+        return store
+
+    @classmethod
+    def join_or_start(cls, tiles: Iterable[Tile], run_id: Optional[int] = None) -> "CheckpointStore":
+        """
+        Join the given run, or the latest running one, starting a new run seeded with `tiles` if there is none.
+
+        Raises:
+            ValueError: The given run doesn't exist or isn't running
+        """
+        if run_id is not None:
+            with SessionLocal() as db:
+                run = db.get(ScrapeRunORM, run_id)
+            if run is None:
+                raise ValueError(f"Scrape run {run_id} does not exist")
+            if run.status != "running":
+                raise ValueError(f"Scrape run {run_id} is {run.status}, not running")
+            logger.info(f"🤝 Joining scrape run {run_id}")
+            return cls(run_id)
+        with SessionLocal() as db:
+            db.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": RUN_LOCK_ID})
+            run = (
+                db.query(ScrapeRunORM)
+                .filter(ScrapeRunORM.status == "running")
+                .order_by(ScrapeRunORM.id.desc())
+                .first()
+            )
+            if run is not None:
+                logger.info(f"🤝 Joining scrape run {run.id}")
+                return cls(run.id)
+            store = cls._create(db, tiles)
+            db.commit()
+        logger.info(f"🆕 Started scrape run {store.run_id}")
+        return store
+
+    @classmethod
+    def latest_unfinished(cls) -> Optional["CheckpointStore"]:
+        """
+        Find the most recent run that crashed or finished with tiles left over.
+        """
+        with SessionLocal() as db:
+            run = (
+                db.query(ScrapeRunORM)
+                .filter(ScrapeRunORM.status.in_(("running", "incomplete")))
+                .order_by(ScrapeRunORM.id.desc())
+                .first()
+            )
+            return cls(run.id) if run else None
+
+    def reopen(self) -> int:
+        """
+        Make the remaining tiles of the run claimable again, with a fresh attempt budget.
+
+        Returns:
+            Number of tiles left to scrape
+        """
+        with SessionLocal() as db:
+            db.execute(
+                update(ScrapeRunORM)
+                .where(ScrapeRunORM.id == self.run_id)
+                .values(status="running", finished_at=None)
+            )
+            remaining = db.execute(
+                update(ScrapeTileORM)
+                .where(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.status.in_(OPEN_STATUSES))
+                .values(status="pending", attempts=0, lease_owner=None, lease_expires_at=None, retry_at=None)
+            ).rowcount
+            db.commit()
+        return remaining
+
+    def _add_tiles(self, db, tiles: Iterable[Tile]) -> None:
+        rows = [
+            {"run_id": self.run_id, "key": t.key, "south": t.south, "west": t.west,
+             "north": t.north, "east": t.east, "depth": t.depth, "status": "pending"}
+            for t in tiles
+        ]
+        if rows:
+            db.execute(insert(ScrapeTileORM).values(rows).on_conflict_do_nothing())
+
+    def _set_status(self, db, tiles: Iterable[Tile], status: str) -> None:
+        db.execute(
+            update(ScrapeTileORM)
+            .where(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.key.in_([t.key for t in tiles]))
+            .values(status=status, lease_owner=None, lease_expires_at=None, updated_at=datetime.utcnow())
+        )
+
+    def _claimable(self, max_attempts: int, ready: bool = True):
+        """
+        Tiles with attempts left that nobody holds; with `ready`, only those whose retry time has come.
+        """
+        pending = ScrapeTileORM.status == "pending"
+        if ready:
+            pending = and_(pending, or_(ScrapeTileORM.retry_at.is_(None), ScrapeTileORM.retry_at <= DB_NOW))
+        return and_(
+            ScrapeTileORM.run_id == self.run_id,
+            ScrapeTileORM.attempts < max_attempts,
+            or_(
+                pending,
+                and_(ScrapeTileORM.status.in_(LEASED_STATUSES), ScrapeTileORM.lease_expires_at < DB_NOW),
+            ),
+        )
+
+    def claim(self, owner: str, lease_seconds: int, max_attempts: int) -> Optional[Tuple[Tile, int]]:
+        """
+        Lease the next claimable tile to `owner`, skipping tiles other workers are claiming right now.
+
+        Tiles that failed before come after all fresh ones.
+
+        Returns:
+            The tile and how many times it has been claimed, including this time
+        """
+        with SessionLocal() as db:
+            candidate = (
+                select(ScrapeTileORM.key)
+                .where(self._claimable(max_attempts))
+                .order_by(ScrapeTileORM.attempts, ScrapeTileORM.depth, ScrapeTileORM.key)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            row = db.execute(
+                update(ScrapeTileORM)
+                .where(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.key == candidate)
+                .values(
+                    status="leased",
+                    attempts=ScrapeTileORM.attempts + 1,
+                    lease_owner=owner,
+                    lease_expires_at=_lease_expiry(lease_seconds),
+                    retry_at=None,
+                    updated_at=datetime.utcnow(),
+                )
+                .returning(ScrapeTileORM.south, ScrapeTileORM.west, ScrapeTileORM.north,
+                           ScrapeTileORM.east, ScrapeTileORM.depth, ScrapeTileORM.attempts)
+                .execution_options(synchronize_session=False)
+            ).first()
+            db.commit()
+        if row is None:
+            return None
+        return Tile(row.south, row.west, row.north, row.east, row.depth), row.attempts
+
+    def renew(self, owner: str, lease_seconds: int) -> None:
+        """
+        Extend every lease held by `owner`.
+        """
+        with SessionLocal() as db:
+            db.execute(
+                update(ScrapeTileORM)
+                .where(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.status.in_(LEASED_STATUSES),
+                       ScrapeTileORM.lease_owner == owner)
+                .values(lease_expires_at=_lease_expiry(lease_seconds))
+            )
+            db.commit()
+
+    def release(self, tile: Tile, retry_in: float = 0) -> None:
+        """
+        Put a tile back in the queue after a failed attempt, to be retried in `retry_in` seconds.
+        """
+        with SessionLocal() as db:
+            self._set_status(db, [tile], "pending")
+            db.execute(
+                update(ScrapeTileORM)
+                .where(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.key == tile.key)
+                .values(retry_at=_lease_expiry(retry_in))
+            )
+            db.commit()
+
+    def mark_fetched(self, tile: Tile) -> None:
+        """
+        Record that a leased tile was scraped and only waits to be persisted.
+        """
+        with SessionLocal() as db:
+            db.execute(
+                update(ScrapeTileORM)
+                .where(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.key == tile.key,
+                       ScrapeTileORM.status == "leased")
+                .values(status="fetched", updated_at=datetime.utcnow())
+            )
+            db.commit()
+
+    def _scraping_elsewhere(self, owner: str):
+        """
+        Tiles other live workers are still scraping; they may yet split or fail back into the queue.
+        """
+        return and_(
+            ScrapeTileORM.run_id == self.run_id,
+            ScrapeTileORM.status == "leased",
+            ScrapeTileORM.lease_owner != owner,
+            ScrapeTileORM.lease_expires_at >= DB_NOW,
+        )
+
+    def is_drained(self, owner: str, max_attempts: int) -> bool:
+        """
+        Whether `owner` will never be able to claim another tile of the run.
+
+        Tiles waiting for their retry time still count as claimable.
+        """
+        with SessionLocal() as db:
+            busy = db.query(ScrapeTileORM.key).filter(
+                or_(self._claimable(max_attempts, ready=False), self._scraping_elsewhere(owner))
+            )
+            return not db.query(busy.exists()).scalar()
+
+    def unresolved(self, max_attempts: int) -> List[Tile]:
+        """
+        Tiles of the run that failed `max_attempts` times and were given up on.
+        """
+        with SessionLocal() as db:
+            rows = (
+                db.query(ScrapeTileORM)
+                .filter(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.status.in_(OPEN_STATUSES),
+                        ScrapeTileORM.attempts >= max_attempts)
+                .order_by(ScrapeTileORM.key)
+                .all()
+            )
+            return [Tile(r.south, r.west, r.north, r.east, r.depth) for r in rows]
+
+    def mark_split(self, tile: Tile, children: List[Tile]) -> None:
+        with SessionLocal() as db:
+            self._add_tiles(db, children)
+            self._set_status(db, [tile], "split")
+            db.commit()
+
+    def mark_done(self, tiles: List[Tile]) -> None:
+        if not tiles:
+            return
+        with SessionLocal() as db:
+            self._set_status(db, tiles, "done")
+            db.commit()
+
+    def finish(self, owner: str) -> Optional[str]:
+        """
+        Give up the leases `owner` still holds and close the run, as `completed`
+        or, if tiles are still left, `incomplete`.
+
+        Does nothing while other workers still hold live leases on the run;
+        the last worker to finish closes it.
+
+        Returns:
+            The status the run was closed with, or None if it is still in
+            progress on other workers or was already closed by another one
+        """
+        with SessionLocal() as db:
+            db.execute(
+                update(ScrapeTileORM)
+                .where(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.status.in_(LEASED_STATUSES),
+                       ScrapeTileORM.lease_owner == owner)
+                .values(status="pending", lease_owner=None, lease_expires_at=None)
+            )
+            db.commit()
+            held = db.query(ScrapeTileORM.key).filter(
+                ScrapeTileORM.run_id == self.run_id,
+                ScrapeTileORM.status.in_(LEASED_STATUSES),
+                ScrapeTileORM.lease_expires_at >= DB_NOW,
+            )
+            if db.query(held.exists()).scalar():
+                logger.info(f"⏳ Scrape run {self.run_id} still has tiles in progress on other workers")
+                return None
+            remaining = (
+                db.query(ScrapeTileORM)
+                .filter(ScrapeTileORM.run_id == self.run_id, ScrapeTileORM.status.in_(OPEN_STATUSES))
+                .count()
+            )
+            status = "incomplete" if remaining else "completed"
+            closed = db.execute(
+                update(ScrapeRunORM)
+                .where(ScrapeRunORM.id == self.run_id, ScrapeRunORM.status == "running")
+                .values(status=status, finished_at=datetime.utcnow())
+            ).rowcount
+            db.commit()
+        if not closed:
+            logger.info(f"⏳ Scrape run {self.run_id} was already closed by another worker")
+            return None
+        logger.info(f"🏁 Scrape run {self.run_id} {status} ({remaining} tiles left)")
+        return status
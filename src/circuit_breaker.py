@@ -0,0 +1,95 @@
+"""
+Circuit breaker that stops hammering the Dyrt API while it is down.
+"""
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Trips when too many recent requests fail and fails fast while tripped.
+
+    The breaker is `closed` while the failure rate over the last `window`
+    requests stays below `failure_rate` (once at least `min_requests` were
+    seen). Above it, the breaker turns `open` and every request fails with
+    CircuitOpenError for `open_seconds`. Then it turns `half_open` and lets
+    `probes` requests through: one success closes it again, one failure
+    reopens it. A single breaker is shared by all workers of a scraper.
+    """
+
+    def __init__(self, failure_rate: float = 0.5, window: int = 20, min_requests: int = 10,
+                 open_seconds: float = 30.0, probes: int = 1):
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = "closed"
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_started = 0.0
+        self.opened_at: Optional[datetime] = None
+        self.trips = 0
+        self.rejected = 0
+
+    def before_request(self) -> None:
+        """
+        Admit a request, or raise CircuitOpenError if the circuit doesn't allow one right now.
+        """
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit open after repeated upstream failures, retrying at most every {self.open_seconds:.0f}s")
+            self.state = "half_open"
+            self._probes_in_flight = 0
+        if self.state == "half_open":
+            now = time.monotonic()
+            # A probe that never reported back (e.g. it was cancelled) frees its slot after open_seconds
+            if self._probes_in_flight >= self.probes and now - self._probe_started < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit half-open, waiting for the probe request")
+            if self._probes_in_flight >= self.probes:
+                self._probes_in_flight = 0
+            self._probes_in_flight += 1
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        if self.state == "half_open":
+            self.state = "closed"
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == "half_open":
+            self._trip()
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if (self.state == "closed" and len(self._outcomes) >= self.min_requests
+                and failures / len(self._outcomes) >= self.failure_rate):
+            self._trip()
+
+    def _trip(self) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self.opened_at = datetime.now(timezone.utc)
+        self.trips += 1
+
+    def snapshot(self) -> Dict:
+        failures = self._outcomes.count(False)
+        return {
+            "state": self.state,
+            "recent_requests": len(self._outcomes),
+            "recent_failure_rate": round(failures / len(self._outcomes), 2) if self._outcomes else 0.0,
+            "opened_at": self.opened_at.isoformat() if self.opened_at else None,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
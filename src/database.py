@@ -1,16 +1,20 @@
 """
 Database connection and ORM models for the scraper.
 """
+import csv
+import hashlib
+import io
+import json
 import os
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from loguru import logger
-from sqlalchemy import Column, DateTime, Float, String, Boolean, Integer, create_engine, Table, MetaData
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import Column, DateTime, Float, ForeignKey, String, Boolean, Integer, create_engine, Table, MetaData, func, literal_column, text
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 # Load environment variables
 load_dotenv()
@@ -64,16 +68,88 @@ class CampgroundORM(Base):
     price_high = Column(Float, nullable=True)
     availability_updated_at = Column(DateTime, nullable=True)
     address = Column(String, nullable=True)  # Bonus field
+    content_hash = Column(String(64), nullable=True)  # Hash of the scraped payload, see content_hash()
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class ScrapeRunORM(Base):
+    """
+    SQLAlchemy ORM model for a scrape run, used for checkpointing.
+    """
+    __tablename__ = "scrape_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    status = Column(String, nullable=False, default="running")  # running, incomplete, completed
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class ScrapeTileORM(Base):
+    """
+    SQLAlchemy ORM model for a tile of a scrape run and its progress.
+    """
+    __tablename__ = "scrape_tiles"
+
+    run_id = Column(Integer, ForeignKey("scrape_runs.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String, primary_key=True)
+    south = Column(Float, nullable=False)
+    west = Column(Float, nullable=False)
+    north = Column(Float, nullable=False)
+    east = Column(Float, nullable=False)
+    depth = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False, default="pending")  # pending, leased, fetched, split, done
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    retry_at = Column(DateTime, nullable=True)  # a failed tile isn't claimed again before this time
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GeocodeCacheORM(Base):
+    """
+    SQLAlchemy ORM model for cached reverse-geocoding results, keyed by rounded coordinates.
+    """
+    __tablename__ = "geocode_cache"
+
+    key = Column(String, primary_key=True)  # "lat,lon" rounded to the cache precision
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    address = Column(String, nullable=True)  # NULL when the geocoder found nothing
+    fetched_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class GeocodeQueueORM(Base):
+    """
+    SQLAlchemy ORM model for campgrounds waiting for the geocoding backfill to fill in their address.
+    """
+    __tablename__ = "geocode_queue"
+
+    campground_id = Column(String, primary_key=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    enqueued_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=True)  # set after a failed lookup, None means due now
+
+# Schema changes for tables created by earlier versions; create_all() never alters existing tables
+MIGRATIONS = [
+    "ALTER TABLE campgrounds ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE scrape_tiles ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE scrape_tiles ADD COLUMN IF NOT EXISTS lease_owner VARCHAR",
+    "ALTER TABLE scrape_tiles ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITHOUT TIME ZONE",
+    "ALTER TABLE scrape_tiles ADD COLUMN IF NOT EXISTS retry_at TIMESTAMP WITHOUT TIME ZONE",
+    "ALTER TABLE geocode_queue ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP WITHOUT TIME ZONE",
+    # Spatial index for the bbox and radius searches of the API (see src/spatial.py)
+    "CREATE INDEX IF NOT EXISTS ix_campgrounds_location ON campgrounds USING gist (point(longitude, latitude))",
+]
+
 def init_db():
     """
-    Initialize the database by creating all tables.
+    Initialize the database by creating all tables and applying pending migrations.
     """
     try:
         logger.info("Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for statement in MIGRATIONS:
+                conn.execute(text(statement))
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
@@ -89,4 +165,208 @@ def get_db():
     except Exception as e:
         logger.error(f"Error getting database session: {e}")
         db.close()
-        raise
\ No newline at end of file
+        raise
+
+def db_session():
+    """
+    FastAPI dependency: a database session that is closed once the request is done.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+HASH_EXCLUDED = {"content_hash", "created_at", "updated_at"}
+
+def content_hash(row: Dict) -> str:
+    """
+    Hash the scraped payload of a campground row, ignoring bookkeeping columns.
+    """
+    payload = {key: value for key, value in row.items() if key not in HASH_EXCLUDED}
+    encoded = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def upsert_campgrounds(db: Session, rows: List[Dict], batch_size: int = 500) -> Tuple[Dict[str, int], List[Dict]]:
+    """
+    Insert or update campground rows with batched INSERT ... ON CONFLICT (id) DO UPDATE statements.
+
+    Existing rows are only rewritten when their `content_hash` differs, so
+    `updated_at` marks real changes; an address filled in by the geocoding
+    backfill is kept when the new row has none. Each batch is committed on its own, so a
+    failing batch is rolled back and logged without losing the batches around
+    it. `created_at` is only set on insert. Rows must not repeat an id within a
+    batch.
+
+    Returns:
+        Counts of inserted, changed, unchanged and failed rows, and the
+        inserted or changed rows that still have no address (see `enqueue_geocoding`)
+    """
+    table = CampgroundORM.__table__
+    counts = {"inserted": 0, "changed": 0, "unchanged": 0, "failed": 0}
+    ungeocoded: List[Dict] = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        stmt = insert(table).values(batch)
+        updates = {name: stmt.excluded[name] for name in batch[0] if name not in ("id", "created_at")}
+        updates["address"] = func.coalesce(stmt.excluded.address, table.c.address)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_=updates,
+            where=table.c.content_hash.is_distinct_from(stmt.excluded.content_hash),
+        ).returning(table.c.id, table.c.latitude, table.c.longitude, table.c.address,
+                    literal_column("xmax = 0").label("inserted"))
+        try:
+            written = db.execute(stmt).all()
+            db.commit()
+        except Exception as e:
+            logger.error(f"❗ Upsert of {len(batch)} campgrounds failed: {getattr(e, 'orig', e)}")
+            db.rollback()
+            counts["failed"] += len(batch)
+            continue
+        inserted = sum(row.inserted for row in written)
+        counts["inserted"] += inserted
+        counts["changed"] += len(written) - inserted
+        counts["unchanged"] += len(batch) - len(written)
+        ungeocoded.extend({"id": row.id, "latitude": row.latitude, "longitude": row.longitude}
+                          for row in written if not row.address)
+    return counts, ungeocoded
+
+def enqueue_geocoding(db: Session, rows: List[Dict]) -> int:
+    """
+    Queue campground rows without an address for the geocoding backfill.
+
+    Pass only rows that were just inserted or changed, so unchanged rows
+    aren't queued again on every scrape. Campgrounds that are already
+    queued get their coordinates refreshed but keep their attempts, so the
+    backfill still gives up on coordinates it can't resolve.
+
+    Returns:
+        Number of rows queued
+    """
+    entries = [
+        {"campground_id": row["id"], "latitude": row["latitude"], "longitude": row["longitude"]}
+        for row in rows if not row.get("address")
+    ]
+    if not entries:
+        return 0
+    try:
+        stmt = insert(GeocodeQueueORM).values(entries)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[GeocodeQueueORM.campground_id],
+            set_={"latitude": stmt.excluded.latitude, "longitude": stmt.excluded.longitude},
+        ))
+        db.commit()
+    except Exception as e:
+        logger.error(f"❗ Queueing {len(entries)} campgrounds for geocoding failed: {getattr(e, 'orig', e)}")
+        db.rollback()
+        return 0
+    return len(entries)
+
+def _pg_array(values: Optional[List[str]]) -> Optional[str]:
+    """
+    Encode a list of strings as a Postgres array literal for COPY.
+    """
+    if values is None:
+        return None
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'"{v}"' for v in escaped) + "}"
+
+
+class CopyLoader:
+    """
+    Bulk-loads campgrounds through an unlogged staging table.
+
+    Rows are streamed into the staging table with COPY FROM STDIN as they
+    arrive and merged into `campgrounds` with a single INSERT ... SELECT ...
+    ON CONFLICT statement at the end, so the live table is only locked for
+    the merge. Only one loader may run at a time, as they share the table.
+    """
+    STAGING_TABLE = "campgrounds_staging"
+    NULL = "\\N"
+
+    def __init__(self):
+        self.table = CampgroundORM.__table__
+        self.columns = [column.name for column in self.table.columns]
+        self.array_columns = {column.name for column in self.table.columns if isinstance(column.type, ARRAY)}
+        self.conn = None
+
+    def begin(self) -> None:
+        self.conn = engine.raw_connection()
+        with self.conn.cursor() as cur:
+            # Recreated on every load so the staging table always matches the live schema
+            cur.execute(f"DROP TABLE IF EXISTS {self.STAGING_TABLE}")
+            cur.execute(
+                f"CREATE UNLOGGED TABLE {self.STAGING_TABLE} "
+                f"(LIKE {self.table.name} INCLUDING DEFAULTS)"
+            )
+        self.conn.commit()
+
+    def copy(self, rows: List[Dict]) -> int:
+        """
+        Append rows to the staging table.
+
+        Returns:
+            Number of rows copied
+        """
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            values = (
+                _pg_array(row.get(name)) if name in self.array_columns else row.get(name)
+                for name in self.columns
+            )
+            writer.writerow([self.NULL if value is None else value for value in values])
+        buf.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {self.STAGING_TABLE} ({', '.join(self.columns)}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{self.NULL}')",
+                buf,
+            )
+        self.conn.commit()
+        return len(rows)
+
+    def merge(self) -> Tuple[Dict[str, int], List[Dict]]:
+        """
+        Merge the staged rows into the campgrounds table and empty the staging table.
+
+        Only rows whose `content_hash` changed are rewritten, keeping any
+        backfilled address when the staged row has none.
+
+        Returns:
+            Counts of inserted, changed and unchanged rows, and the inserted
+            or changed rows that still have no address
+        """
+        columns = ", ".join(self.columns)
+        updates = ", ".join(
+            f"{name} = COALESCE(EXCLUDED.{name}, {self.table.name}.{name})" if name == "address"
+            else f"{name} = EXCLUDED.{name}"
+            for name in self.columns if name not in ("id", "created_at")
+        )
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"SELECT COUNT(DISTINCT id) FROM {self.STAGING_TABLE}")
+                staged = cur.fetchone()[0]
+                cur.execute(
+                    f"INSERT INTO {self.table.name} ({columns}) "
+                    f"SELECT DISTINCT ON (id) {columns} FROM {self.STAGING_TABLE} "
+                    f"ON CONFLICT (id) DO UPDATE SET {updates} "
+                    f"WHERE {self.table.name}.content_hash IS DISTINCT FROM EXCLUDED.content_hash "
+                    f"RETURNING id, latitude, longitude, address, (xmax = 0)"
+                )
+                written = cur.fetchall()
+                cur.execute(f"TRUNCATE {self.STAGING_TABLE}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        inserted = sum(row[4] for row in written)
+        counts = {"inserted": inserted, "changed": len(written) - inserted, "unchanged": staged - len(written)}
+        ungeocoded = [{"id": pid, "latitude": lat, "longitude": lon} for pid, lat, lon, address, _ in written if not address]
+        return counts, ungeocoded
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
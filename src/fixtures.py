@@ -0,0 +1,52 @@
+"""
+Recorded search-results responses, keyed by bounding box and page.
+"""
+import os
+import re
+from typing import Dict, Iterator, Optional
+
+
+def fixture_name(params: Dict) -> str:
+    """
+    File name of the recording for a search request's query parameters.
+    """
+    bbox = re.sub(r"[^0-9.,-]", "", str(params["filter[search][bbox]"])).replace(",", "_")
+    return f"bbox_{bbox}_p{params['page[number]']}_n{params['page[size]']}.json"
+
+
+class FixtureStore:
+    """
+    Directory of raw `search-results` response bodies.
+
+    Each response is stored byte for byte under a name derived from its
+    bbox, page number and page size, so the mock server can replay a scrape
+    exactly as it was recorded.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, params: Dict) -> str:
+        return os.path.join(self.root, fixture_name(params))
+
+    def save(self, params: Dict, content: bytes) -> None:
+        path = self.path(params)
+        # Write under a temporary name so a replay never sees a half-written file
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def load(self, params: Dict) -> Optional[bytes]:
+        try:
+            with open(self.path(params), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in sorted(os.listdir(self.root)) if name.endswith(".json"))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,117 @@
+"""
+Offline reverse geocoding against a local gazetteer of US places and counties.
+"""
+import csv
+import math
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+class GazetteerIndex:
+    """
+    Nearest-place lookups over a gazetteer loaded into a grid index.
+
+    Coordinates are kept in flat `array('d')` columns and bucketed into
+    `cell_size`-degree grid cells that hold `array('I')` row numbers, so the
+    index stays compact for tens of thousands of places. A lookup scans rings
+    of cells around the query point until no unscanned cell can hold a closer
+    place, so it only compares a handful of candidates. Places farther than
+    `max_distance_km` are not returned.
+
+    The file format is the US Census Bureau gazetteer (tab-separated with
+    NAME, USPS, INTPTLAT and INTPTLONG columns), which covers both places
+    and counties.
+    """
+
+    EARTH_RADIUS_KM = 6371.0
+    KM_PER_DEGREE = 111.195
+
+    def __init__(self, cell_size: float = 0.5, max_distance_km: float = 50.0):
+        self.cell_size = cell_size
+        self.max_distance_km = max_distance_km
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self.labels: List[str] = []
+        self.cells: Dict[Tuple[int, int], array] = {}
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "GazetteerIndex":
+        """
+        Build an index from a gazetteer file.
+
+        Args:
+            path: Path of the tab-separated gazetteer file
+        """
+        index = cls(**kwargs)
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f, delimiter="\t")
+            header = [column.strip().upper() for column in next(reader)]
+            name, state = header.index("NAME"), header.index("USPS")
+            lat, lon = header.index("INTPTLAT"), header.index("INTPTLONG")
+            for row in reader:
+                try:
+                    index.add(float(row[lat]), float(row[lon]), f"{row[name].strip()}, {row[state].strip()}")
+                except (IndexError, ValueError):
+                    continue
+        logger.info(f"🗺️ Loaded {len(index.labels)} gazetteer places from {path}")
+        return index
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def add(self, lat: float, lon: float, label: str) -> None:
+        self.cells.setdefault(self._cell(lat, lon), array("I")).append(len(self.labels))
+        self.latitudes.append(lat)
+        self.longitudes.append(lon)
+        self.labels.append(label)
+
+    def _distance_km(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        dlat = math.radians(lat2 - lat1)
+        dlon = math.radians(lon2 - lon1)
+        a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+        return 2 * self.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+    def nearest(self, lat: float, lon: float) -> Optional[Tuple[str, float]]:
+        """
+        Find the gazetteer place closest to a coordinate.
+
+        Candidates are ranked by equirectangular distance, which is accurate
+        well beyond `max_distance_km`; only the winner gets a haversine distance.
+
+        Returns:
+            The place's "name, state" label and its distance in km, or None if
+            nothing is within `max_distance_km`
+        """
+        row, col = self._cell(lat, lon)
+        lats, lons = self.latitudes, self.longitudes
+        cos_lat = math.cos(math.radians(lat))
+        # Cells `ring` steps out are at least (ring - 1) * step degrees of latitude away
+        step = self.cell_size * min(1.0, max(math.cos(math.radians(min(abs(lat) + self.cell_size, 90.0))), 0.01))
+        best = None
+        best_sq = (self.max_distance_km / self.KM_PER_DEGREE) ** 2
+        ring = 0
+        while (max(ring - 1, 0) * step) ** 2 <= best_sq:
+            for i in range(row - ring, row + ring + 1):
+                edge = abs(i - row) == ring
+                for j in range(col - ring, col + ring + 1):
+                    if not edge and abs(j - col) != ring:
+                        continue
+                    for k in self.cells.get((i, j), ()):
+                        dy = lats[k] - lat
+                        dx = (lons[k] - lon) * cos_lat
+                        sq = dx * dx + dy * dy
+                        if sq <= best_sq:
+                            best, best_sq = k, sq
+            ring += 1
+        if best is None:
+            return None
+        return self.labels[best], self._distance_km(lat, lon, lats[best], lons[best])
+
+    def reverse(self, lat: float, lon: float) -> Optional[str]:
+        """
+        Describe a coordinate by its nearest gazetteer place, e.g. "Near Bend city, OR".
+        """
+        match = self.nearest(lat, lon)
+        return f"Near {match[0]}" if match else None
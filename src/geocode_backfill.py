@@ -0,0 +1,213 @@
+"""
+Background reverse-geocoding of campgrounds that were saved without an address.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from geopy.geocoders import Nominatim
+from loguru import logger
+from sqlalchemy import bindparam, delete, func, or_, update
+
+from src.database import CampgroundORM, GeocodeQueueORM, SessionLocal
+from src.gazetteer import GazetteerIndex
+from src.geocode_cache import GeocodeCache
+from src.metrics import Histogram
+
+GEOCODER_MODES = ("online", "offline", "offline-then-online")
+GEOCODER_MODE = os.getenv("GEOCODER_MODE", "online")
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "data/gazetteer.txt")
+
+
+class GeocodeBackfill:
+    """
+    Drains the `geocode_queue` table, filling in campground addresses.
+
+    The scraper saves campgrounds without address parts right away and queues
+    them here, so geocoding never slows down a scrape. Lookups go through the
+    geocode cache first; Nominatim itself is called at most `rate` times per
+    second, as its usage policy requires, so only one backfill should run at
+    a time. Addresses are written back one batch at a time. A failed lookup
+    is retried in a later run, `retry_backoff` seconds after the first
+    failure and doubling after each further one; entries that keep failing
+    are left in the queue after `max_attempts` tries. A run stops after
+    `max_consecutive_failures` failed lookups in a row, so a geocoder outage
+    doesn't use up the attempts of the whole queue.
+
+    `mode` (GEOCODER_MODE in the environment) picks the backend: "online"
+    uses Nominatim, "offline" names the nearest place in a local gazetteer
+    (GAZETTEER_PATH) and "offline-then-online" asks Nominatim only for
+    coordinates with no gazetteer place nearby.
+    """
+
+    def __init__(self, cache: Optional[GeocodeCache] = None, rate: float = 1.0,
+                 batch_size: int = 50, max_attempts: int = 3, mode: Optional[str] = None,
+                 gazetteer_path: Optional[str] = None, retry_backoff: float = 3600.0,
+                 max_consecutive_failures: int = 10):
+        self.mode = mode or GEOCODER_MODE
+        if self.mode not in GEOCODER_MODES:
+            raise ValueError(f"Unknown geocoder mode: {self.mode}")
+        self.gazetteer = self._load_gazetteer(gazetteer_path or GAZETTEER_PATH)
+        self.cache = cache or GeocodeCache()
+        self.interval = 1.0 / rate
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_consecutive_failures = max_consecutive_failures
+        self.geolocator = Nominatim(user_agent="camp_scraper")
+        self._next_call = 0.0
+        self.offline_hits = 0
+        self.lookup_seconds = Histogram()
+        self.write_seconds = Histogram()
+
+    def _load_gazetteer(self, path: str) -> Optional[GazetteerIndex]:
+        if self.mode == "online":
+            return None
+        try:
+            return GazetteerIndex.load(path)
+        except OSError as e:
+            if self.mode == "offline":
+                raise
+            logger.warning(f"⚠️ Gazetteer not available, geocoding online only: {e}")
+            return None
+
+    def _get_address_from_coords(self, lat: float, lon: float) -> Tuple[bool, Optional[str]]:
+        """
+        Reverse-geocode a coordinate with the configured backend.
+
+        Returns:
+            Whether the lookup succeeded, and the address (None if there is none)
+        """
+        if self.gazetteer is not None:
+            address = self.gazetteer.reverse(lat, lon)
+            if address:
+                self.offline_hits += 1
+                return True, address
+            if self.mode == "offline":
+                return True, None
+        hit, address = self.cache.get(lat, lon)
+        if hit:
+            return True, address
+        wait = self._next_call - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._next_call = time.monotonic() + self.interval
+        try:
+            location = self.geolocator.reverse((lat, lon), language="en", timeout=10)
+        except Exception as e:
+            logger.warning(f"Could not resolve address from coords {lat},{lon}: {e}")
+            return False, None
+        address = location.address if location else None
+        self.cache.put(lat, lon, address)
+        return True, address
+
+    def _drop_resolved(self) -> None:
+        """
+        Remove queue entries whose campground already has an address.
+        """
+        with SessionLocal() as db:
+            db.execute(
+                delete(GeocodeQueueORM)
+                .where(GeocodeQueueORM.campground_id == CampgroundORM.id, CampgroundORM.address.is_not(None))
+            )
+            db.commit()
+
+    def _next_batch(self, db):
+        return (
+            db.query(GeocodeQueueORM)
+            .filter(GeocodeQueueORM.attempts < self.max_attempts)
+            .filter(or_(GeocodeQueueORM.next_attempt_at.is_(None), GeocodeQueueORM.next_attempt_at <= datetime.utcnow()))
+            .order_by(GeocodeQueueORM.enqueued_at, GeocodeQueueORM.campground_id)
+            .limit(self.batch_size)
+            .all()
+        )
+
+    def _write_batch(self, db, addresses: Dict[str, str], done: List[str], failed: List[str]) -> None:
+        """
+        Store the addresses of a batch and update its queue entries in one transaction.
+        """
+        campgrounds = CampgroundORM.__table__
+        if addresses:
+            db.execute(
+                update(campgrounds)
+                .where(campgrounds.c.id == bindparam("campground_id"), campgrounds.c.address.is_(None))
+                .values(address=bindparam("new_address")),
+                [{"campground_id": cid, "new_address": address} for cid, address in addresses.items()],
+            )
+        if done:
+            db.execute(delete(GeocodeQueueORM).where(GeocodeQueueORM.campground_id.in_(done)))
+        if failed:
+            # retry_backoff seconds after the first failure, doubling with every further one
+            backoff = func.power(2, GeocodeQueueORM.attempts) * timedelta(seconds=self.retry_backoff)
+            db.execute(
+                update(GeocodeQueueORM)
+                .where(GeocodeQueueORM.campground_id.in_(failed))
+                .values(attempts=GeocodeQueueORM.attempts + 1, next_attempt_at=datetime.utcnow() + backoff)
+            )
+        db.commit()
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Geocode queued campgrounds until the queue is drained or `limit` entries were processed.
+
+        Returns:
+            Counts of resolved, not found and failed lookups
+        """
+        logger.info("🧭 Geocoding backfill started")
+        stats = {"resolved": 0, "not_found": 0, "failed": 0}
+        self.offline_hits = 0
+        self.lookup_seconds = Histogram()
+        self.write_seconds = Histogram()
+        self.cache.reset_stats()
+        self.cache.evict_expired()
+        self._drop_resolved()
+        processed = 0
+        consecutive_failures = 0
+        with SessionLocal() as db:
+            while (limit is None or processed < limit) and consecutive_failures < self.max_consecutive_failures:
+                entries = self._next_batch(db)
+                if limit is not None:
+                    entries = entries[:limit - processed]
+                if not entries:
+                    break
+                addresses: Dict[str, str] = {}
+                done: List[str] = []
+                failed: List[str] = []
+                for entry in entries:
+                    if consecutive_failures >= self.max_consecutive_failures:
+                        logger.warning(f"⚠️ {consecutive_failures} lookups in a row failed, "
+                                       f"leaving the rest of the queue for a later run")
+                        break
+                    started = time.perf_counter()
+                    ok, address = self._get_address_from_coords(entry.latitude, entry.longitude)
+                    self.lookup_seconds.observe(time.perf_counter() - started)
+                    if not ok:
+                        consecutive_failures += 1
+                        failed.append(entry.campground_id)
+                        continue
+                    consecutive_failures = 0
+                    done.append(entry.campground_id)
+                    if address:
+                        addresses[entry.campground_id] = address
+                db.rollback()  # end the read transaction before writing the batch
+                started = time.perf_counter()
+                try:
+                    self._write_batch(db, addresses, done, failed)
+                    self.write_seconds.observe(time.perf_counter() - started)
+                except Exception as e:
+                    logger.error(f"❗ Saving {len(entries)} geocoded addresses failed: {getattr(e, 'orig', e)}")
+                    db.rollback()
+                    break
+                processed += len(done) + len(failed)
+                stats["resolved"] += len(addresses)
+                stats["not_found"] += len(done) - len(addresses)
+                stats["failed"] += len(failed)
+                logger.info(f"📫 Geocoded {processed} queued campgrounds so far: {stats}")
+        logger.info(f"✅ Geocoding backfill finished: {stats}")
+        if self.gazetteer is not None:
+            logger.info(f"📚 Resolved {self.offline_hits} addresses from the gazetteer")
+        logger.info(f"🗺️ Geocode cache: {self.cache.snapshot()}")
+        logger.info(f"⏱️ Lookup seconds (incl. rate limiting): {self.lookup_seconds.snapshot()}, "
+                    f"batch writes: {self.write_seconds.snapshot()}")
+        return stats
@@ -0,0 +1,110 @@
+"""
+Persistent reverse-geocoding cache, keyed by coordinates rounded to a fixed grid.
+"""
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from src.database import GeocodeCacheORM, SessionLocal
+
+
+class GeocodeCache:
+    """
+    Caches reverse-geocoded addresses in the `geocode_cache` table.
+
+    Coordinates are rounded to `precision` decimals (4 is roughly 11 m), so
+    points in the same grid cell share one entry. Entries older than `ttl_days`
+    count as misses and are deleted by `evict_expired`. Empty geocoder results
+    are cached as well, so that places without an address aren't looked up
+    again on every run. Database errors are logged and treated as misses.
+    """
+
+    def __init__(self, precision: int = 4, ttl_days: int = 90):
+        self.precision = precision
+        self.ttl = timedelta(days=ttl_days)
+        self._lock = Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stored": 0, "errors": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _round(self, lat: float, lon: float) -> Tuple[float, float, str]:
+        lat, lon = round(lat, self.precision), round(lon, self.precision)
+        return lat, lon, f"{lat:.{self.precision}f},{lon:.{self.precision}f}"
+
+    def get(self, lat: float, lon: float) -> Tuple[bool, Optional[str]]:
+        """
+        Look up the cached address for a coordinate.
+
+        Returns:
+            Whether there was a fresh entry, and its address
+        """
+        _, _, key = self._round(lat, lon)
+        try:
+            with SessionLocal() as db:
+                entry = db.get(GeocodeCacheORM, key)
+        except Exception as e:
+            logger.warning(f"Geocode cache lookup failed for {key}: {e}")
+            self._count("errors")
+            return False, None
+        if entry is None:
+            self._count("misses")
+            return False, None
+        if entry.fetched_at < datetime.utcnow() - self.ttl:
+            self._count("expired")
+            return False, None
+        self._count("hits")
+        return True, entry.address
+
+    def put(self, lat: float, lon: float, address: Optional[str]) -> None:
+        """
+        Store or refresh the address of a coordinate.
+        """
+        lat, lon, key = self._round(lat, lon)
+        values = {"key": key, "latitude": lat, "longitude": lon, "address": address, "fetched_at": datetime.utcnow()}
+        stmt = insert(GeocodeCacheORM).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GeocodeCacheORM.key],
+            set_={"address": stmt.excluded.address, "fetched_at": stmt.excluded.fetched_at},
+        )
+        try:
+            with SessionLocal() as db:
+                db.execute(stmt)
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Geocode cache write failed for {key}: {e}")
+            self._count("errors")
+            return
+        self._count("stored")
+
+    def evict_expired(self) -> int:
+        """
+        Delete entries older than the TTL.
+
+        Returns:
+            Number of entries deleted
+        """
+        try:
+            with SessionLocal() as db:
+                deleted = db.execute(
+                    delete(GeocodeCacheORM).where(GeocodeCacheORM.fetched_at < datetime.utcnow() - self.ttl)
+                ).rowcount
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Geocode cache eviction failed: {e}")
+            return 0
+        if deleted:
+            logger.info(f"🧹 Evicted {deleted} expired geocode cache entries")
+        return deleted
+
+    def snapshot(self) -> Dict[str, float]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["expired"]
+        return {**self.stats, "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0}
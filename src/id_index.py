@@ -0,0 +1,81 @@
+"""
+Compact index of the campground ids already produced by a scrape run.
+"""
+from typing import Iterable, List, Optional, Set
+
+from src.models.record import CampgroundRecord
+
+
+class IdIndex:
+    """
+    Remembers which campground ids were seen, using one bit per numeric id.
+
+    The Dyrt ids are small decimal numbers, so a growable bitmap takes about
+    `max_id / 8` bytes however many campgrounds were scraped, where a `set`
+    of strings costs roughly a hundred bytes per id. An id only goes to the
+    bitmap if it is already covered or the bitmap would stay within
+    `BITS_PER_ID` bits per id seen, so a few large ids can't inflate it;
+    those, ids that aren't decimal and ids above `max_bitmap_id` go to a
+    regular set.
+    """
+
+    BITS_PER_ID = 64
+
+    def __init__(self, max_bitmap_id: int = 1 << 24):
+        self.max_bitmap_id = max_bitmap_id
+        self._bits = bytearray()
+        self._other: Set[str] = set()
+        self.size = 0
+
+    def _number(self, campground_id: str) -> Optional[int]:
+        """
+        The id's bit number, if it is a canonical decimal number small enough for the bitmap.
+        """
+        if not (campground_id.isascii() and campground_id.isdigit()):
+            return None
+        if campground_id.startswith("0") and campground_id != "0":
+            return None
+        number = int(campground_id)
+        return number if number <= self.max_bitmap_id else None
+
+    def _has_bit(self, number: int) -> bool:
+        byte = number >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (number & 7)))
+
+    def add(self, campground_id: str) -> bool:
+        """
+        Record an id.
+
+        Returns:
+            Whether the id was new
+        """
+        if campground_id in self:
+            return False
+        number = self._number(campground_id)
+        if number is not None and (number < len(self._bits) * 8 or number < self.BITS_PER_ID * (self.size + 1)):
+            byte = number >> 3
+            if byte >= len(self._bits):
+                # Grow geometrically so sequential ids don't reallocate every time
+                size = min(max(byte + 1, 2 * len(self._bits)), (self.max_bitmap_id >> 3) + 1)
+                self._bits.extend(bytes(size - len(self._bits)))
+            self._bits[byte] |= 1 << (number & 7)
+        else:
+            self._other.add(campground_id)
+        self.size += 1
+        return True
+
+    def keep_new(self, records: Iterable[CampgroundRecord]) -> List[CampgroundRecord]:
+        """
+        Record the ids of `records` and return the records whose id wasn't seen before.
+        """
+        return [record for record in records if self.add(record.id)]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, campground_id: str) -> bool:
+        # An id may sit in the set although it fits the bitmap now, if the bitmap was smaller when it was added
+        number = self._number(campground_id)
+        if number is not None and self._has_bit(number):
+            return True
+        return campground_id in self._other
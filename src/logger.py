@@ -7,12 +7,14 @@ from datetime import datetime
 
 from loguru import logger
 
+LOGS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
+
 def setup_logger():
     """
     Set up the logger.
     """
     # Create logs directory if it doesn't exist
-    logs_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
+    logs_dir = LOGS_DIR
     os.makedirs(logs_dir, exist_ok=True)
     
     # Log file path with timestamp
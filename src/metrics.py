@@ -0,0 +1,264 @@
+"""
+Timing and queue-depth instrumentation for scrape runs.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from src.logger import LOGS_DIR
+from src.tiling import Tile
+
+# Upper bounds of the duration histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations, cheap enough to update for every request.
+
+    A value lands in the first bucket whose upper bound is at least the value;
+    the extra last bucket counts values above every bound.
+    """
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-quantile as the upper bound of the bucket it falls in.
+        """
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "p99": round(self.quantile(0.99), 4),
+            "max": round(self.max, 4),
+        }
+
+
+class DepthGauge:
+    """
+    Latest, peak and average value of a sampled queue depth.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.peak = 0
+        self._total = 0
+        self._samples = 0
+
+    def set(self, value: int) -> None:
+        self.value = value
+        self.peak = max(self.peak, value)
+        self._total += value
+        self._samples += 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "current": self.value,
+            "peak": self.peak,
+            "mean": round(self._total / self._samples, 2) if self._samples else 0.0,
+        }
+
+
+class RunMetrics:
+    """
+    Durations and queue depths of one scrape run, per run and per tile.
+
+    Every stage has a run-wide histogram. Stage durations measured for a
+    page are also summed up per tile, together with the tile's pages,
+    campgrounds, attempts, wall time and outcome, so the slowest parts of
+    the map can be found after the fact.
+    """
+
+    def __init__(self, stages: Iterable[str]):
+        self.started_at = datetime.now(timezone.utc)
+        self.histograms = {stage: Histogram() for stage in stages}
+        self.gauges: Dict[str, DepthGauge] = {}
+        self.tiles: Dict[str, Dict] = {}
+
+    def _tile(self, key: str) -> Dict:
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.tiles[key] = {"depth": None, "attempts": 0, "outcome": None, "seconds": 0.0,
+                                      "pages": 0, "campgrounds": 0, "stages": {}}
+        return tile
+
+    def observe(self, stage: str, seconds: float, tile_key: Optional[str] = None) -> None:
+        self.histograms[stage].observe(seconds)
+        if tile_key is not None:
+            stages = self._tile(tile_key)["stages"]
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def page(self, tile_key: str) -> None:
+        self._tile(tile_key)["pages"] += 1
+
+    def tile_finished(self, tile: Tile, outcome: str, seconds: float, campgrounds: int = 0) -> None:
+        """
+        Record one attempt at a tile: "fetched", "split" or "failed".
+        """
+        stats = self._tile(tile.key)
+        stats["depth"] = tile.depth
+        stats["attempts"] += 1
+        stats["outcome"] = outcome
+        stats["seconds"] += seconds
+        stats["campgrounds"] += campgrounds
+
+    def depth(self, name: str, value: int) -> None:
+        gauge = self.gauges.get(name)
+        if gauge is None:
+            gauge = self.gauges[name] = DepthGauge()
+        gauge.set(value)
+
+    def slowest_tiles(self, count: int = 5) -> List[Dict]:
+        ranked = sorted(self.tiles.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        return [{"tile": key, **stats} for key, stats in ranked[:count]]
+
+    def summary(self) -> str:
+        """
+        One line per stage with its count and latency percentiles in milliseconds.
+        """
+        lines = []
+        for stage, histogram in self.histograms.items():
+            if histogram.count:
+                snap = histogram.snapshot()
+                lines.append(f"{stage}: n={snap['count']} total={snap['sum']:.2f}s mean={snap['mean'] * 1000:.1f}ms "
+                             f"p50={snap['p50'] * 1000:.1f}ms p95={snap['p95'] * 1000:.1f}ms max={snap['max'] * 1000:.1f}ms")
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "stages": {stage: histogram.snapshot() for stage, histogram in self.histograms.items()},
+            "queues": {name: gauge.snapshot() for name, gauge in self.gauges.items()},
+            "tiles": self.tiles,
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def _label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+
+class PrometheusWriter:
+    """
+    Renders metrics in the Prometheus text exposition format (version 0.0.4).
+
+    Each call adds one metric family; samples are (labels, value) pairs.
+    Histograms are rendered from `Histogram`s as cumulative `_bucket`
+    series plus `_sum` and `_count`.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._lines: List[str] = []
+
+    def _series(self, name: str, labels: Dict[str, str], value: float) -> None:
+        if labels:
+            rendered = ",".join(f'{key}="{_label_value(val)}"' for key, val in labels.items())
+            self._lines.append(f"{name}{{{rendered}}} {_number(value)}")
+        else:
+            self._lines.append(f"{name} {_number(value)}")
+
+    def _family(self, name: str, kind: str, help_text: str) -> str:
+        name = self.prefix + name
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def gauge(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> None:
+        name = self._family(name, "gauge", help_text)
+        for labels, value in samples:
+            self._series(name, labels, value)
+
+    def counter(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> None:
+        name = self._family(name, "counter", help_text)
+        for labels, value in samples:
+            self._series(name, labels, value)
+
+    def histogram(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], Histogram]]) -> None:
+        name = self._family(name, "histogram", help_text)
+        for labels, histogram in samples:
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                self._series(f"{name}_bucket", {**labels, "le": _number(bound)}, cumulative)
+            self._series(f"{name}_bucket", {**labels, "le": "+Inf"}, histogram.count)
+            self._series(f"{name}_sum", labels, histogram.sum)
+            self._series(f"{name}_count", labels, histogram.count)
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+@contextmanager
+def profiled(label: str, enabled: bool = True, top: int = 25) -> Iterator[Optional[cProfile.Profile]]:
+    """
+    Profile the block with cProfile and write the stats to `logs/<label>_<time>.prof`.
+
+    Only the calling thread is profiled, i.e. the scraper's event loop;
+    database writes run in worker threads and appear as time waited for
+    them, and parser processes aren't included at all. The `top` functions
+    by cumulative time are logged as well.
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(LOGS_DIR, exist_ok=True)
+        path = os.path.join(LOGS_DIR, f"{label}_{datetime.now():%Y%m%d_%H%M%S}.prof")
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+        logger.info(f"🔬 Profile written to {path} (open it with `python -m pstats {path}`)\n{report.getvalue()}")
@@ -0,0 +1,227 @@
+"""
+Local stand-in for The Dyrt search API, for offline tests and benchmarks.
+
+Usage:
+    python -m src.mock_server --density 5 --latency-ms 40
+    python -m src.mock_server --fixtures fixtures/
+    DYRT_SEARCH_URL=http://localhost:8001/api/v6/locations/search-results python main.py --scrape
+"""
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from loguru import logger
+
+from src.fixtures import FixtureStore
+from src.tiling import US_BOUNDS
+
+SEARCH_PATH = "/api/v6/locations/search-results"
+
+REGIONS = ["California", "Oregon", "Washington", "Utah", "Colorado", "Arizona", "Texas", "Montana", "Maine", "Florida"]
+AREAS = ["National Forest", "State Park", "BLM Land", "County Park", None]
+CITIES = ["Bend", "Moab", "Fresno", "Flagstaff", "Boulder", "Missoula", None]
+
+
+def synthetic_item(pid: str, lat: float, lon: float, rng: random.Random) -> Dict:
+    """
+    A search result shaped like the API's JSON:API items.
+    """
+    return {
+        "id": pid,
+        "type": "location-search-results",
+        "links": {"self": f"https://thedyrt.com/api/v6/locations/{pid}"},
+        "attributes": {
+            "name": f"Campground {pid}",
+            "latitude": lat,
+            "longitude": lon,
+            "region-name": rng.choice(REGIONS),
+            "administrative-area": rng.choice(AREAS),
+            "nearest-city-name": rng.choice(CITIES),
+            "accommodation-type-names": ["Tent", "RV"],
+            "bookable": rng.random() < 0.3,
+            "camper-types": ["tent", "rv", "trailer"],
+            "operator": "Recreation.gov",
+            "photo-url": f"https://images.thedyrt.com/photos/{pid}.jpg",
+            "photo-urls": [f"https://images.thedyrt.com/photos/{pid}-{n}.jpg" for n in range(3)],
+            "photos-count": 3,
+            "rating": round(rng.uniform(1, 5), 1),
+            "reviews-count": rng.randint(0, 500),
+            "slug": f"campground-{pid}",
+            "price-low": "12.0",
+            "price-high": "35.0",
+            "availability-updated-at": "2024-05-01T10:00:00.000Z",
+        },
+    }
+
+
+def synthetic_page(size: int = 100, seed: int = 1) -> List[Dict]:
+    """
+    A page of `size` search results at random US coordinates, for parser benchmarks.
+    """
+    rng = random.Random(seed)
+    return [
+        synthetic_item(str(100000 + i), rng.uniform(US_BOUNDS["south"], US_BOUNDS["north"]),
+                       rng.uniform(US_BOUNDS["west"], US_BOUNDS["east"]), rng)
+        for i in range(size)
+    ]
+
+
+class SyntheticDataset:
+    """
+    Deterministic campgrounds spread over the contiguous US.
+
+    `density` is the average number of campgrounds per square degree,
+    unless an exact `count` is given. A `hotspot_share` of them is packed
+    into a few dense clusters, the way real campgrounds crowd around
+    national parks, so the scraper's tiles get split just as unevenly as
+    against the live site. The same `seed` always yields the same campgrounds.
+    """
+
+    def __init__(self, density: float = 2.0, hotspot_share: float = 0.5, hotspots: int = 8, seed: int = 1,
+                 bounds: Dict[str, float] = US_BOUNDS, count: Optional[int] = None):
+        rng = random.Random(seed)
+        south, north, west, east = bounds["south"], bounds["north"], bounds["west"], bounds["east"]
+        if count is None:
+            count = int(density * (north - south) * (east - west))
+        centers = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(hotspots)]
+        points = []
+        for i in range(count):
+            if centers and rng.random() < hotspot_share:
+                lat, lon = rng.choice(centers)
+                lat = min(max(rng.gauss(lat, 0.4), south), north)
+                lon = min(max(rng.gauss(lon, 0.4), west), east)
+            else:
+                lat, lon = rng.uniform(south, north), rng.uniform(west, east)
+            points.append((round(lon, 6), round(lat, 6), str(100000 + i)))
+        # Sorted by longitude, so a bbox only scans the points within its longitude range
+        points.sort()
+        self._lons = [p[0] for p in points]
+        self._points = points
+        self.seed = seed
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    @lru_cache(maxsize=256)
+    def _hits(self, west: float, south: float, east: float, north: float) -> Tuple[int, ...]:
+        lo, hi = bisect_left(self._lons, west), bisect_right(self._lons, east)
+        return tuple(i for i in range(lo, hi) if south <= self._points[i][1] <= north)
+
+    def search(self, west: float, south: float, east: float, north: float, page: int, per_page: int) -> Dict:
+        """
+        One page of the campgrounds inside the bbox (edges included, like the live API).
+        """
+        hits = self._hits(west, south, east, north)
+        items = []
+        for i in hits[(page - 1) * per_page: page * per_page]:
+            lon, lat, pid = self._points[i]
+            items.append(synthetic_item(pid, lat, lon, random.Random(f"{self.seed}-{pid}")))
+        return {"data": items, "meta": {"record-count": len(hits)}}
+
+
+def create_app(dataset: Optional[SyntheticDataset] = None, fixtures: Optional[FixtureStore] = None,
+               latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0) -> FastAPI:
+    """
+    Build the mock API.
+
+    Args:
+        dataset: Synthetic campgrounds to serve
+        fixtures: Recorded responses to replay instead; unrecorded requests get a 404
+        latency: Seconds added to every response
+        jitter: Up to this many extra seconds, picked at random per response
+        error_rate: Share of requests answered with a 503
+    """
+    if (dataset is None) == (fixtures is None):
+        raise ValueError("Serve either a synthetic dataset or recorded fixtures")
+    app = FastAPI(title="Mock Dyrt search API")
+    stats = {"requests": 0, "errors": 0, "missing": 0}
+
+    @app.get(SEARCH_PATH)
+    async def search_results(request: Request):
+        stats["requests"] += 1
+        if latency or jitter:
+            await asyncio.sleep(latency + random.uniform(0, jitter))
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": "Service Unavailable"}, status_code=503)
+        params = request.query_params
+        if fixtures is not None:
+            content = fixtures.load(params)
+            if content is None:
+                stats["missing"] += 1
+                logger.warning(f"⚠️ No recording for {dict(params)}")
+                return JSONResponse({"error": "Not recorded"}, status_code=404)
+            return Response(content, media_type="application/json")
+        west, south, east, north = map(float, params["filter[search][bbox]"].split(","))
+        page = int(params.get("page[number]", 1))
+        per_page = int(params.get("page[size]", 100))
+        return JSONResponse(dataset.search(west, south, east, north, page, per_page))
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def start_process(*args: str) -> Tuple[subprocess.Popen, str]:
+    """
+    Start the mock server with these command-line arguments on a free port and wait until it answers.
+
+    Returns:
+        The server process and its search URL
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.mock_server", *args, "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("Mock server exited before it started serving")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1)
+            return proc, f"http://127.0.0.1:{port}{SEARCH_PATH}"
+        except httpx.TransportError:
+            time.sleep(0.2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Dyrt search API")
+    parser.add_argument("--fixtures", help="Replay the responses recorded in this directory instead of synthetic data")
+    parser.add_argument("--density", type=float, default=2.0, help="Synthetic campgrounds per square degree")
+    parser.add_argument("--count", type=int, help="Exact number of synthetic campgrounds, instead of --density")
+    parser.add_argument("--hotspot-share", type=float, default=0.5, help="Share of synthetic campgrounds packed into dense clusters")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic dataset")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency of up to this many milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests answered with a 503")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8001, help="Port to bind to")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        store = FixtureStore(args.fixtures)
+        logger.info(f"📼 Replaying {len(store)} recorded responses from {args.fixtures}")
+        app = create_app(fixtures=store, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                         error_rate=args.error_rate)
+    else:
+        dataset = SyntheticDataset(density=args.density, hotspot_share=args.hotspot_share, seed=args.seed,
+                                   count=args.count)
+        logger.info(f"🏕️ Serving {len(dataset)} synthetic campgrounds")
+        app = create_app(dataset=dataset, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                         error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,68 @@
+"""
+Compact in-flight representation of a validated campground.
+"""
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+from src.models.campground import Campground
+
+# Low-cardinality values shared by many campgrounds, stored once via sys.intern
+INTERNED_FIELDS = frozenset({"type", "region_name", "administrative_area", "nearest_city_name", "operator"})
+INTERNED_LIST_FIELDS = frozenset({"accommodation_type_names", "camper_types"})
+LIST_FIELDS = INTERNED_LIST_FIELDS | {"photo_urls"}
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+class CampgroundRecord:
+    """
+    A validated campground as it travels from the parser to the database writer.
+
+    Uses `__slots__` instead of a model instance, tuples instead of lists and
+    interned strings for repeated values such as region names and camper
+    types, so that a full-country scrape keeps far less memory in flight.
+    Fields match the `campgrounds` table columns, in the same order.
+    """
+
+    __slots__ = (
+        "id", "type", "links_self", "name", "latitude", "longitude", "region_name",
+        "administrative_area", "nearest_city_name", "accommodation_type_names", "bookable",
+        "camper_types", "operator", "photo_url", "photo_urls", "photos_count", "rating",
+        "reviews_count", "slug", "price_low", "price_high", "availability_updated_at", "address",
+    )
+
+    def __init__(self, *values: Any):
+        for name, value in zip(self.__slots__, values, strict=True):
+            if name in INTERNED_FIELDS:
+                value = _intern(value)
+            elif name in INTERNED_LIST_FIELDS:
+                value = tuple(map(sys.intern, value))
+            elif name in LIST_FIELDS:
+                value = tuple(value)
+            setattr(self, name, value)
+
+    @classmethod
+    def from_campground(cls, camp: Campground) -> "CampgroundRecord":
+        return cls(*(
+            camp.links.self if name == "links_self" else getattr(camp, name) for name in cls.__slots__
+        ))
+
+    def astuple(self) -> Tuple[Any, ...]:
+        """
+        Field values in `__slots__` order, e.g. to send the record to another process.
+        """
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def to_row(self) -> Dict[str, Any]:
+        """
+        Column values for the `campgrounds` table, with lists for array columns.
+        """
+        return {
+            name: list(getattr(self, name)) if name in LIST_FIELDS else getattr(self, name)
+            for name in self.__slots__
+        }
+
+    def __repr__(self) -> str:
+        return f"CampgroundRecord(id={self.id!r}, name={self.name!r})"
@@ -0,0 +1,149 @@
+"""
+Fast-path parsing of search-results pages into validated Campground models.
+"""
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from dateutil.parser import parse as parse_date
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+
+from src.models.campground import Campground
+from src.models.record import CampgroundRecord
+from src.tiling import owns
+
+CAMPGROUND_LIST = TypeAdapter(List[Campground])
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse an API timestamp, trying the ISO-8601 fast path before dateutil.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return parse_date(value)
+    except Exception as e:
+        logger.warning(f"⛔ Failed to parse date: {e}")
+        return None
+
+
+def map_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map one JSON:API search result onto the Campground model's aliases.
+
+    `address` is composed from the name and location parts; it is None when
+    they are all missing, so the campground can be queued for reverse geocoding.
+    """
+    attrs = item.get("attributes") or {}
+    get = attrs.get
+    name = get("name")
+    administrative_area = get("administrative-area")
+    nearest_city_name = get("nearest-city-name")
+    region_name = get("region-name")
+    address = ", ".join(p for p in (name, administrative_area, nearest_city_name, region_name) if p)
+    return {
+        "id": item.get("id"),
+        "type": item.get("type"),
+        "links": {"self": (item.get("links") or {}).get("self")},
+        "name": name,
+        "latitude": get("latitude"),
+        "longitude": get("longitude"),
+        "region-name": region_name or "Unknown",
+        "administrative-area": administrative_area,
+        "nearest-city-name": nearest_city_name,
+        "accommodation-type-names": get("accommodation-type-names", []),
+        "bookable": get("bookable", False),
+        "camper-types": get("camper-types", []),
+        "operator": get("operator"),
+        "photo-url": get("photo-url"),
+        "photo-urls": get("photo-urls", []),
+        "photos-count": get("photos-count", 0),
+        "rating": get("rating"),
+        "reviews-count": get("reviews-count", 0),
+        "slug": get("slug"),
+        "price-low": get("price-low") or None,
+        "price-high": get("price-high") or None,
+        "availability-updated-at": parse_datetime(get("availability-updated-at")),
+        "address": address or None,
+    }
+
+
+def drop_outside(items: List[Dict[str, Any]], bounds: Dict[str, float]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Drop search results that lie outside the half-open bounds of the searched box.
+
+    Neighbouring boxes share edges and the API returns results on both sides
+    of each edge, so every boundary campground would otherwise be parsed and
+    written twice. Items without usable coordinates are kept for validation
+    to reject.
+
+    Returns:
+        The remaining items and the number of items dropped
+    """
+    kept = []
+    for item in items:
+        attrs = item.get("attributes") or {}
+        try:
+            inside = owns(bounds, float(attrs["latitude"]), float(attrs["longitude"]))
+        except (KeyError, TypeError, ValueError):
+            inside = True
+        if inside:
+            kept.append(item)
+    return kept, len(items) - len(kept)
+
+
+def parse_page(items: List[Dict[str, Any]]) -> List[Campground]:
+    """
+    Map and validate a whole page of search results in one pass.
+
+    The page is validated as a single list; if any item is invalid, it is
+    logged with its validation errors and the page is validated again
+    without the failing items.
+    """
+    data = [map_item(item) for item in items]
+    try:
+        return CAMPGROUND_LIST.validate_python(data)
+    except ValidationError as ve:
+        failed: Dict[int, List[str]] = {}
+        for error in ve.errors():
+            index, *field = error["loc"]
+            name = ".".join(map(str, field)) or "item"
+            failed.setdefault(index, []).append(f"{name}: {error['msg']} (got {error.get('input')!r:.80})")
+    for index in sorted(failed):
+        logger.warning(f"❌ Validation failed {data[index]['id']}: {'; '.join(failed[index])}")
+    return CAMPGROUND_LIST.validate_python([d for i, d in enumerate(data) if i not in failed])
+
+
+def parse_records(items: List[Dict[str, Any]]) -> List[CampgroundRecord]:
+    """
+    Parse a page of search results into compact records for the write pipeline.
+    """
+    return [CampgroundRecord.from_campground(camp) for camp in parse_page(items)]
+
+
+def parse_raw_page(content: bytes, bounds: Dict[str, float]) -> Tuple[Dict[str, Any], int, int, List[tuple], Dict[str, float]]:
+    """
+    Decode and parse a raw search response for `bounds`; runs in parser worker processes.
+
+    Returns:
+        The response's meta and links, the number of items on the page, the
+        number of items dropped as outside `bounds`, the remaining
+        campgrounds as `CampgroundRecord.astuple` tuples and the seconds
+        spent decoding ("parse") and validating ("validate")
+    """
+    started = time.perf_counter()
+    resp = json.loads(content)
+    decoded = time.perf_counter()
+    items = resp.get("data") or []
+    envelope = {"meta": resp.get("meta"), "links": resp.get("links")}
+    kept, outside = drop_outside(items, bounds)
+    records = [record.astuple() for record in parse_records(kept)]
+    timings = {"parse": decoded - started, "validate": time.perf_counter() - decoded}
+    return envelope, len(items), outside, records, timings
@@ -0,0 +1,121 @@
+"""
+Adaptive (AIMD) request rate control shared by all scraper workers.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+
+def retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    """
+    Parse the Retry-After header of a response into a number of seconds.
+    """
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateController:
+    """
+    Paces requests to a shared target rate and adapts that rate to upstream health.
+
+    The rate grows additively while responses are successful and faster than
+    `latency_target`, and is cut multiplicatively on 429/5xx responses and
+    transport errors. A Retry-After header pauses every worker until it expires.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 2.0,
+        min_rate: float = 0.2,
+        max_rate: float = 50.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_target: float = 2.0,
+    ):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats = {
+            "requests": 0,
+            "successes": 0,
+            "slow": 0,
+            "throttled": 0,
+            "errors": 0,
+            "min_rate": self.rate,
+            "max_rate": self.rate,
+        }
+
+    async def acquire(self) -> None:
+        """
+        Wait for the next request slot at the current rate.
+        """
+        now = time.monotonic()
+        slot = max(now, self._next_slot, self._paused_until)
+        self._next_slot = slot + 1.0 / self.rate
+        self.stats["requests"] += 1
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def record_success(self, latency: float) -> None:
+        self.stats["successes"] += 1
+        if latency > self.latency_target:
+            self.stats["slow"] += 1
+            return
+        # Additive increase: roughly `increase` req/s per second of healthy traffic
+        self._set_rate(self.rate + self.increase / self.rate)
+
+    def record_failure(self, retry_after: Optional[float] = None, throttled: bool = False) -> None:
+        self.stats["throttled" if throttled else "errors"] += 1
+        now = time.monotonic()
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        # Requests already in flight fail together; only back off once per interval
+        if now - self._last_decrease >= 1.0 / self.rate:
+            self._last_decrease = now
+            self._set_rate(self.rate * self.decrease)
+
+    def record_response(self, response: httpx.Response, latency: float) -> None:
+        if response.status_code == 429 or response.status_code >= 500:
+            self.record_failure(retry_after_seconds(response), throttled=response.status_code == 429)
+        else:
+            self.record_success(latency)
+
+    def _set_rate(self, rate: float) -> None:
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        self.stats["min_rate"] = min(self.stats["min_rate"], self.rate)
+        self.stats["max_rate"] = max(self.stats["max_rate"], self.rate)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            **self.stats,
+            "rate": round(self.rate, 2),
+            "min_rate": round(self.stats["min_rate"], 2),
+            "max_rate": round(self.stats["max_rate"], 2),
+        }
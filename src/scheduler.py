@@ -7,14 +7,17 @@ from datetime import datetime
 import schedule
 from loguru import logger
 
+from src.geocode_backfill import GeocodeBackfill
 from src.scraper import DyrtScraper
 
 class ScraperScheduler:
     """
     Scheduler for running the scraper at regular intervals.
     """
-    def __init__(self):
+    def __init__(self, profile=False):
         self.scraper = DyrtScraper()
+        self.profile = profile
+        self.geocode_backfill = GeocodeBackfill()
     
     def run_scraper(self):
         """
@@ -22,11 +25,25 @@ class ScraperScheduler:
         """
         logger.info(f"Running scheduled scraper job at {datetime.now()}")
         try:
-            self.scraper.run()
+            self.scraper.run(profile=self.profile)
             logger.info("Scheduled scraper job completed successfully")
         except Exception as e:
             logger.error(f"Error in scheduled scraper job: {e}")
     
+    def run_geocode_backfill(self, limit=3000):
+        """
+        Geocode campgrounds queued without an address.
+        
+        Args:
+            limit: Maximum number of campgrounds per job, so a long queue doesn't hold up the scraper job
+        """
+        logger.info(f"Running scheduled geocoding backfill job at {datetime.now()}")
+        try:
+            self.geocode_backfill.run(limit=limit)
+            logger.info("Scheduled geocoding backfill job completed successfully")
+        except Exception as e:
+            logger.error(f"Error in scheduled geocoding backfill job: {e}")
+    
     def schedule_daily(self, hour=2, minute=0):
         """
         Schedule the scraper to run daily at the specified time.
@@ -63,6 +80,16 @@ class ScraperScheduler:
         schedule.every(hours).hours.do(self.run_scraper)
         logger.info(f"Scheduled scraper to run every {hours} hours")
     
+    def schedule_geocode_backfill(self, hours=1):
+        """
+        Schedule the geocoding backfill to run at a regular interval.
+        
+        Args:
+            hours: Interval in hours
+        """
+        schedule.every(hours).hours.do(self.run_geocode_backfill)
+        logger.info(f"Scheduled geocoding backfill to run every {hours} hours")
+    
     def run_forever(self):
         """
         Run the scheduler indefinitely.
@@ -1,53 +1,262 @@
+import asyncio
+import functools
+import json
+import os
+import threading
 import time
-from datetime import datetime
-from typing import Dict, List, Optional
-import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, TypeVar, Union
+from urllib.parse import parse_qs, urlparse
 
-import requests
-from dateutil.parser import parse as parse_date
+import httpx
 from loguru import logger
-from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from tenacity import retry, stop_after_attempt, wait_exponential
-from geopy.geocoders import Nominatim
+from tenacity import RetryCallState, retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
-from src.database import CampgroundORM, get_db
+from src.checkpoint import CheckpointStore
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.database import CopyLoader, content_hash, enqueue_geocoding, get_db, upsert_campgrounds
+from src.fixtures import FixtureStore
+from src.id_index import IdIndex
+from src.logger import LOGS_DIR
+from src.metrics import RunMetrics, profiled
 from src.models.campground import Campground
+from src.models.record import CampgroundRecord
+from src.parser import drop_outside, parse_raw_page, parse_records
+from src.rate_control import AdaptiveRateController, retry_after_seconds
+from src.tile_queue import LocalFrontier, TileQueue
+from src.tiling import US_BOUNDS, AdaptiveTiler, Tile
+
+T = TypeVar("T")
+
+WRITE_MODES = ("upsert", "copy")
+STAGES = ("fetch", "parse", "validate", "save", "geocode")
+# Request latency is measured per HTTP attempt, on top of the per-page stages
+METRIC_STAGES = ("request",) + STAGES
+
+
+class _Session(NamedTuple):
+    """
+    HTTP client, in-flight limit and parser pool of one event loop's run.
+    """
+    owner: Any
+    client: httpx.AsyncClient
+    semaphore: asyncio.Semaphore
+    parse_pool: Optional[ProcessPoolExecutor]
+
+
+# Each asyncio.run gets its own copy of the context, so runs in different threads never share a session
+_session: ContextVar[Optional[_Session]] = ContextVar("dyrt_session", default=None)
+
+
+class ScraperBusyError(RuntimeError):
+    """
+    Raised when a crawl is started on a scraper that is already crawling.
+    """
+
+
+def _in_session(method):
+    """
+    Run a scraper coroutine inside the scraper's HTTP session, opening one if the caller hasn't.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        async with self._client_session():
+            return await method(self, *args, **kwargs)
+    return wrapper
+
+
+def _retry_wait(retry_state: RetryCallState) -> float:
+    """
+    Exponential backoff that never retries sooner than the upstream's Retry-After.
+    """
+    delay = wait_exponential(min=2, max=10)(retry_state)
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        delay = max(delay, retry_after_seconds(exc.response) or 0.0)
+    return delay
 
 
 class DyrtScraper:
-    SEARCH_API_URL = "https://thedyrt.com/api/v6/locations/search-results"
-
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0",
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        })
+    SEARCH_API_URL = os.getenv("DYRT_SEARCH_URL", "https://thedyrt.com/api/v6/locations/search-results")
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0",
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+    }
+
+    def __init__(self, max_in_flight: int = 16, tiler: Optional[AdaptiveTiler] = None,
+                 rate_controller: Optional[AdaptiveRateController] = None, tile_workers: Optional[int] = None,
+                 parse_workers: int = 0, split_failed_after: int = 2, retry_backoff: float = 30.0,
+                 breaker: Optional[CircuitBreaker] = None, search_url: Optional[str] = None,
+                 record_dir: Optional[str] = None):
+        self.max_in_flight = max_in_flight
+        self.parse_workers = parse_workers
+        self.split_failed_after = split_failed_after
+        self.retry_backoff = retry_backoff
+        self.tile_workers = tile_workers or max_in_flight
+        self.tiler = tiler or AdaptiveTiler()
+        self.rate_controller = rate_controller or AdaptiveRateController()
+        self.breaker = breaker or CircuitBreaker()
+        self.search_url = search_url or self.SEARCH_API_URL
+        self.recorder = FixtureStore(record_dir) if record_dir else None
+        self.write_stats: Dict[str, int] = {}
+        self.id_index = IdIndex()
+        self.dedup_stats = {"outside_tile": 0, "repeated_id": 0}
+        self.metrics = RunMetrics(METRIC_STAGES)
+        # Lifetime counters across all runs of this scraper, for monitoring
+        self.campgrounds_written: Dict[str, int] = {}
+        self.upstream_errors: Dict[str, int] = {}
+        self.run_outcomes: Dict[str, int] = {}
+        self.last_run_seconds: Optional[float] = None
+        self.last_success_at: Optional[datetime] = None
+        self._in_flight = 0
+        self._crawl_lock = threading.Lock()
         self.db: Session = get_db()
-        self.geolocator = Nominatim(user_agent="camp_scraper")
 
     def __del__(self):
         if hasattr(self, 'db'):
             self.db.close()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=2, max=10))
-    def _make_request(self, params: Dict) -> Dict:
+    @asynccontextmanager
+    async def _client_session(self):
+        """
+        Open the HTTP client for this run, unless one is already open in the current context.
+
+        All requests made inside the session share one connection pool and one
+        global in-flight limit of `max_in_flight` requests. With `parse_workers`
+        set, the session also owns the pool of parser processes. The session
+        lives in a context variable rather than on the scraper, so runs on
+        other threads' event loops open their own.
+        """
+        current = _session.get()
+        if current is not None and current.owner is self:
+            yield current
+            return
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        async with httpx.AsyncClient(headers=self.HEADERS, timeout=30, limits=limits) as client:
+            parse_pool = None
+            if self.parse_workers > 0:
+                parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+                # Start the workers now, before the run spawns any threads of its own
+                parse_pool.submit(int).result()
+            session = _Session(self, client, asyncio.Semaphore(self.max_in_flight), parse_pool)
+            token = _session.set(session)
+            try:
+                yield session
+            finally:
+                _session.reset(token)
+                if parse_pool is not None:
+                    parse_pool.shutdown(cancel_futures=True)
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether a crawl is in progress on this scraper.
+        """
+        return self._crawl_lock.locked()
+
+    @contextmanager
+    def _exclusive_crawl(self) -> Iterator[None]:
+        """
+        Hold the scraper for one crawl; its per-run state (metrics, seen ids) can't be shared.
+
+        Raises:
+            ScraperBusyError: Another crawl is in progress
+        """
+        if not self._crawl_lock.acquire(blocking=False):
+            raise ScraperBusyError("A crawl is already running on this scraper")
+        try:
+            yield
+        finally:
+            self._crawl_lock.release()
+
+    @property
+    def stage_seconds(self) -> Dict[str, float]:
+        """
+        Seconds spent per stage in the current or last run, summed over concurrent pages.
+        """
+        return {stage: self.metrics.histograms[stage].sum for stage in STAGES}
+
+    @contextmanager
+    def _timed(self, stage: str, tile_key: Optional[str] = None) -> Iterator[None]:
+        """
+        Record the time spent in the block as one `stage` observation, for the run and the tile.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.observe(stage, time.perf_counter() - started, tile_key)
+
+    def _run(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a coroutine to completion on a fresh event loop with an open HTTP client.
+        """
+        async def runner():
+            async with self._client_session():
+                return await factory()
+        return asyncio.run(runner())
+
+    @retry(stop=stop_after_attempt(3), wait=_retry_wait, retry=retry_if_not_exception_type(CircuitOpenError), reraise=True)
+    async def _make_request(self, params: Dict, raw: bool = False):
         logger.debug(f"Request params: {params}")
-        resp = self.session.get(self.SEARCH_API_URL, params=params, timeout=30)
+        try:
+            self.breaker.before_request()
+        except CircuitOpenError:
+            self._count_upstream_error("circuit_open")
+            raise
+        session = _session.get()
+        await self.rate_controller.acquire()
+        async with session.semaphore:
+            self._in_flight += 1
+            self.metrics.depth("requests_in_flight", self._in_flight)
+            started = time.monotonic()
+            try:
+                resp = await session.client.get(self.search_url, params=params)
+            except httpx.TransportError:
+                self.rate_controller.record_failure()
+                self.breaker.record_failure()
+                self._count_upstream_error("transport")
+                raise
+            finally:
+                self._in_flight -= 1
+                self.metrics.depth("requests_in_flight", self._in_flight)
+                self.metrics.observe("request", time.monotonic() - started)
+        self.rate_controller.record_response(resp, time.monotonic() - started)
+        if resp.status_code == 429 or resp.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if resp.status_code >= 400:
+            self._count_upstream_error(str(resp.status_code))
         resp.raise_for_status()
-        return resp.json()
+        if self.recorder is not None:
+            await asyncio.to_thread(self.recorder.save, params, resp.content)
+        return resp.content if raw else resp.json()
 
-    def search_campgrounds(self, bounds: Dict[str, float], page: int = 1, per_page: int = 100) -> Dict:
+    def _count_upstream_error(self, kind: str) -> None:
+        self.upstream_errors[kind] = self.upstream_errors.get(kind, 0) + 1
+
+    @staticmethod
+    def _search_params(bounds: Dict[str, float], page: int, per_page: int) -> Dict:
         bbox = f"{bounds['west']},{bounds['south']},{bounds['east']},{bounds['north']}"
-        params = {
+        return {
             "filter[search][bbox]": bbox,
             "sort": "recommended",
             "page[number]": page,
             "page[size]": per_page,
         }
-        return self._make_request(params)
+
+    @_in_session
+    async def search_campgrounds_async(self, bounds: Dict[str, float], page: int = 1, per_page: int = 100) -> Dict:
+        return await self._make_request(self._search_params(bounds, page, per_page))
+
+    def search_campgrounds(self, bounds: Dict[str, float], page: int = 1, per_page: int = 100) -> Dict:
+        return self._run(lambda: self.search_campgrounds_async(bounds, page, per_page))
 
     def _divide_region(self, bounds: Dict[str, float], divisions: int = 4) -> List[Dict[str, float]]:
         regions = []
@@ -55,172 +264,442 @@ class DyrtScraper:
         lng_step = (bounds["east"] - bounds["west"]) / divisions
         for i in range(divisions):
             for j in range(divisions):
+                # Computed from the indices alone, so neighbouring regions share exact edges
                 south = bounds["south"] + i * lat_step
-                north = south + lat_step
+                north = bounds["south"] + (i + 1) * lat_step if i + 1 < divisions else bounds["north"]
                 west = bounds["west"] + j * lng_step
-                east = west + lng_step
+                east = bounds["west"] + (j + 1) * lng_step if j + 1 < divisions else bounds["east"]
                 regions.append({"south": south, "north": north, "west": west, "east": east})
         return regions
 
-    def _get_address_from_coords(self, lat: float, lon: float) -> Optional[str]:
-        try:
-            location = self.geolocator.reverse((lat, lon), language="en", timeout=10)
-            return location.address if location else None
-        except Exception as e:
-            logger.warning(f"Could not resolve address from coords {lat},{lon}: {e}")
-            return None
+    @staticmethod
+    def _page_count(resp: Dict, per_page: int) -> Optional[int]:
+        """
+        Read the total number of result pages from a search response, if it reports one.
+        """
+        meta = resp.get("meta") or {}
+        for key in ("page-count", "total-pages", "page_count", "total_pages"):
+            if isinstance(meta.get(key), int):
+                return meta[key]
+        for key in ("record-count", "total-count", "total", "count", "record_count", "total_count"):
+            if isinstance(meta.get(key), int):
+                return -(-meta[key] // per_page)
+        last = (resp.get("links") or {}).get("last")
+        if last:
+            values = parse_qs(urlparse(last).query).get("page[number]")
+            if values and values[0].isdigit():
+                return int(values[0])
+        return None
 
-    def _get_campgrounds_in_region(self, bounds: Dict[str, float]) -> List[Campground]:
-        camp_list: List[Campground] = []
-        page = 1
-        while True:
-            resp = self.search_campgrounds(bounds, page)
+    async def _fetch_page(self, bounds: Dict[str, float], page: int, per_page: int) -> Tuple[Dict, int, List[CampgroundRecord]]:
+        """
+        Fetch and parse one result page.
+
+        Without parser processes the page is decoded and validated in this
+        process; otherwise its raw bytes are handed to the parser pool, which
+        sends the campgrounds back as plain tuples. Either way, items outside
+        the half-open `bounds` are dropped before validation. The time spent
+        fetching (including waits for the rate controller and retries),
+        decoding and validating the page is recorded in `metrics`, for the
+        run and for the page's tile.
+
+        Returns:
+            The response (at least its meta and links), the number of items on
+            the page and the parsed campgrounds
+        """
+        tile_key = Tile.from_bounds(bounds).key
+        self.metrics.page(tile_key)
+        with self._timed("fetch", tile_key):
+            content = await self._make_request(self._search_params(bounds, page, per_page), raw=True)
+        parse_pool = _session.get().parse_pool
+        if parse_pool is None:
+            with self._timed("parse", tile_key):
+                resp = json.loads(content)
             items = resp.get("data", [])
-            if not items:
-                break
+            with self._timed("validate", tile_key):
+                kept, outside = drop_outside(items, bounds)
+                records = parse_records(kept)
+            self.dedup_stats["outside_tile"] += outside
+            return resp, len(items), records
+        envelope, item_count, outside, records, timings = await asyncio.get_running_loop().run_in_executor(
+            parse_pool, parse_raw_page, content, bounds
+        )
+        for stage, seconds in timings.items():
+            self.metrics.observe(stage, seconds, tile_key)
+        self.dedup_stats["outside_tile"] += outside
+        return envelope, item_count, [CampgroundRecord(*values) for values in records]
 
-            for item in items:
-                attrs = item.get("attributes", {})
-                availability_updated_at = None
-                if attrs.get("availability-updated-at"):
-                    try:
-                        availability_updated_at = parse_date(attrs["availability-updated-at"])
-                    except Exception as e:
-                        logger.warning(f"⛔ Failed to parse date: {e}")
-
-                address_parts = [
-                    attrs.get("name"),
-                    attrs.get("administrative-area"),
-                    attrs.get("nearest-city-name"),
-                    attrs.get("region-name")
-                ]
-                address = ", ".join(p for p in address_parts if p)
-                if not address:
-                    address = self._get_address_from_coords(attrs.get("latitude"), attrs.get("longitude"))
-
-                data = {
-                    "id": item.get("id"),
-                    "type": item.get("type"),
-                    "links": {"self": item.get("links", {}).get("self")},
-                    "name": attrs.get("name"),
-                    "latitude": attrs.get("latitude"),
-                    "longitude": attrs.get("longitude"),
-                    "region-name": attrs.get("region-name") or "Unknown",
-                    "administrative-area": attrs.get("administrative-area"),
-                    "nearest-city-name": attrs.get("nearest-city-name"),
-                    "accommodation-type-names": attrs.get("accommodation-type-names", []),
-                    "bookable": attrs.get("bookable", False),
-                    "camper-types": attrs.get("camper-types", []),
-                    "operator": attrs.get("operator"),
-                    "photo-url": attrs.get("photo-url"),
-                    "photo-urls": attrs.get("photo-urls", []),
-                    "photos-count": attrs.get("photos-count", 0),
-                    "rating": attrs.get("rating"),
-                    "reviews-count": attrs.get("reviews-count", 0),
-                    "slug": attrs.get("slug"),
-                    "price-low": float(attrs["price-low"]) if attrs.get("price-low") else None,
-                    "price-high": float(attrs["price-high"]) if attrs.get("price-high") else None,
-                    "availability-updated-at": availability_updated_at,
-                }
+    async def _walk_pages(self, bounds: Dict[str, float], too_dense: Optional[Callable[[int], bool]] = None,
+                          per_page: int = 100) -> Tuple[List[CampgroundRecord], bool]:
+        """
+        Fetch result pages for a bounding box, stopping early once `too_dense(page_count)` is true.
 
-                try:
-                    camp = Campground.model_validate(data)
-                    camp.__dict__["address"] = address
-                    camp_list.append(camp)
-                except ValidationError as ve:
-                    logger.warning(f"❌ Validation failed {data['id']}: {ve}")
-
-            if len(items) < 100:
-                break
+        When the first response reports how many pages there are, the remaining
+        pages are requested concurrently; otherwise pages are walked one by one
+        until a short page comes back. Returns the parsed campgrounds and whether
+        more pages were left unfetched.
+        """
+        resp, item_count, camp_list = await self._fetch_page(bounds, 1, per_page)
+        if item_count < per_page:
+            return camp_list, False
+
+        page_count = self._page_count(resp, per_page)
+        if page_count is not None:
+            if too_dense is not None and too_dense(page_count):
+                return camp_list, True
+            # A page that fails for good cancels its siblings, so none outlive the failed tile
+            try:
+                async with asyncio.TaskGroup() as group:
+                    pages = [group.create_task(self._fetch_page(bounds, page, per_page))
+                             for page in range(2, page_count + 1)]
+            except ExceptionGroup as eg:
+                # Fail the tile with the page's own error, as gather did
+                raise eg.exceptions[0]
+            for task in pages:
+                camp_list.extend(task.result()[2])
+            return camp_list, False
+
+        page = 1
+        while True:
+            # After a full page there may be another one
+            if too_dense is not None and too_dense(page + 1):
+                return camp_list, True
             page += 1
-            time.sleep(1)
+            _, item_count, campgrounds = await self._fetch_page(bounds, page, per_page)
+            camp_list.extend(campgrounds)
+            if item_count < per_page:
+                return camp_list, False
 
+    async def _get_campgrounds_in_region_async(self, bounds: Dict[str, float]) -> List[CampgroundRecord]:
+        camp_list, _ = await self._walk_pages(bounds)
         logger.info(f"🧩 Found {len(camp_list)} in region.")
         return camp_list
 
-    def get_all_us_campgrounds(self) -> List[Campground]:
-        us_bounds = {"north": 49.38, "south": 24.52, "east": -66.95, "west": -124.77}
-        regions = self._divide_region(us_bounds)
-        all_campgrounds: List[Campground] = []
+    def _get_campgrounds_in_region(self, bounds: Dict[str, float]) -> List[CampgroundRecord]:
+        return self._run(lambda: self._get_campgrounds_in_region_async(bounds))
 
-        def process(region):
-            try:
-                logger.info(f"📍 Processing region: {region}")
-                return self._get_campgrounds_in_region(region)
-            except Exception as e:
-                logger.warning(f"⚠️ Region failed: {region}, Error: {e}")
-                return []
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(process, region) for region in regions]
-            for future in concurrent.futures.as_completed(futures):
-                all_campgrounds.extend(future.result())
-
-        logger.info(f"✅ Total campgrounds collected (parallel): {len(all_campgrounds)}")
-        return all_campgrounds
+    async def _scrape_tile(self, tile: Tile) -> Tuple[List[CampgroundRecord], List[Tile]]:
+        """
+        Scrape a single tile, splitting it into quadrants when it is too dense.
+
+        Returns the tile's campgrounds, or no campgrounds and the child tiles when the
+        tile was split (the children cover everything the partial walk had found).
+        """
+        camp_list, truncated = await self._walk_pages(tile.bounds, lambda pages: self.tiler.should_split(tile, pages))
+        if truncated:
+            logger.info(f"🔀 Splitting dense tile {tile.key} (depth {tile.depth})")
+            return [], tile.split()
+        logger.info(f"🧩 Found {len(camp_list)} in tile {tile.key}.")
+        return camp_list, []
+
+    def _us_tiles(self) -> List[Tile]:
+        return [Tile.from_bounds(region) for region in self._divide_region(US_BOUNDS)]
+
+    async def _crawl(self, sink: Callable[[Tile, List[CampgroundRecord]], Awaitable[None]], frontier) -> int:
+        """
+        Scrape tiles from `frontier` with `tile_workers` concurrent workers.
 
-    def save_campgrounds(self, campgrounds: List[Campground]) -> None:
-        seen_ids = set()
-        count = 0
-        for cg in campgrounds:
-            if cg.id in seen_ids:
-                continue
-            seen_ids.add(cg.id)
-
-            existing = self.db.get(CampgroundORM, cg.id)
-            record = cg.model_dump(by_alias=True)
-
-            if existing:
-                for field, val in record.items():
-                    if field == "links":
-                        setattr(existing, "links_self", val.get("self"))
+        Each finished tile and its campgrounds are handed to `sink`; dense
+        tiles are split back into the frontier. Failed tiles are deferred by
+        the frontier and retried with a longer backoff once the fresh tiles
+        are done; a tile that failed `split_failed_after` times is split
+        instead, so one bad region can't take its whole area down with it.
+        Tiles that still fail are listed at the end. A tile that failed while
+        the circuit breaker tripped or wasn't closed (including a failed
+        half-open probe) is only deferred, never split, so a run during an
+        outage ends quickly. Campgrounds whose id was
+        already produced in this run are dropped before they reach `sink`.
+        Returns the number of campgrounds produced.
+        """
+        total = 0
+        tile_count = 0
+        self.rate_controller.reset_stats()
+        self.id_index = IdIndex()
+        self.dedup_stats = {"outside_tile": 0, "repeated_id": 0}
+        self.metrics = RunMetrics(METRIC_STAGES)
+
+        async def worker():
+            nonlocal total, tile_count
+            while (tile := await frontier.get()) is not None:
+                tile_count += 1
+                started = time.perf_counter()
+                trips = self.breaker.trips
+                try:
+                    logger.info(f"📍 Processing tile: {tile.key} (depth {tile.depth})")
+                    campgrounds, children = await self._scrape_tile(tile)
+                    if children:
+                        self.metrics.tile_finished(tile, "split", time.perf_counter() - started)
+                        await frontier.split(tile, children)
+                        continue
+                    self.metrics.tile_finished(tile, "fetched", time.perf_counter() - started, len(campgrounds))
+                    await frontier.fetched(tile)
+                except Exception as e:
+                    self.metrics.tile_finished(tile, "failed", time.perf_counter() - started)
+                    logger.warning(f"⚠️ Tile failed: {tile.key}, Error: {e!r}")
+                    # A failure while the upstream as a whole is down says nothing about the tile itself
+                    upstream_down = (isinstance(e, CircuitOpenError) or self.breaker.trips != trips
+                                     or self.breaker.state != "closed")
+                    if (not upstream_down and frontier.attempts(tile) >= self.split_failed_after
+                            and self.tiler.can_split(tile)):
+                        logger.info(f"🔀 Splitting failing tile {tile.key} (depth {tile.depth})")
+                        await frontier.split(tile, tile.split())
                     else:
-                        setattr(existing, field.replace("-", "_"), val)
-                existing.address = getattr(cg, "address", None)
-                existing.updated_at = datetime.utcnow()
-            else:
-                self.db.add(CampgroundORM(
-                    id=record["id"],
-                    type=record["type"],
-                    links_self=record["links"]["self"],
-                    name=record["name"],
-                    latitude=record["latitude"],
-                    longitude=record["longitude"],
-                    region_name=record["region-name"],
-                    administrative_area=record.get("administrative-area"),
-                    nearest_city_name=record.get("nearest-city-name"),
-                    accommodation_type_names=record.get("accommodation-type-names", []),
-                    bookable=record.get("bookable", False),
-                    camper_types=record.get("camper-types", []),
-                    operator=record.get("operator"),
-                    photo_url=record.get("photo-url"),
-                    photo_urls=record.get("photo-urls", []),
-                    photos_count=record.get("photos-count", 0),
-                    rating=record.get("rating"),
-                    reviews_count=record.get("reviews-count", 0),
-                    slug=record.get("slug"),
-                    price_low=record.get("price-low"),
-                    price_high=record.get("price-high"),
-                    availability_updated_at=record.get("availability-updated-at"),
-                    address=getattr(cg, "address", None)
-                ))
-            count += 1
+                        await frontier.fail(tile)
+                    continue
+                new = self.id_index.keep_new(campgrounds)
+                self.dedup_stats["repeated_id"] += len(campgrounds) - len(new)
+                campgrounds = new
+                total += len(campgrounds)
+                await sink(tile, campgrounds)
+
+        async with asyncio.TaskGroup() as group:
+            for _ in range(self.tile_workers):
+                group.create_task(worker())
+
+        logger.info(f"✅ Total campgrounds collected (concurrent): {total} from {tile_count} tiles")
+        unresolved = await frontier.unresolved()
+        if unresolved:
+            logger.warning(f"⛔ {len(unresolved)} tiles still failing after retries: {', '.join(t.key for t in unresolved)}")
+        if self.breaker.trips:
+            logger.warning(f"🔌 Circuit breaker: {self.breaker.snapshot()}")
+        logger.info(f"🧹 Dropped {sum(self.dedup_stats.values())} duplicates: {self.dedup_stats}")
+        logger.info(f"📈 Request rate settled at {self.rate_controller.rate:.2f} req/s: {self.rate_controller.snapshot()}")
+        return total
+
+    @_in_session
+    async def get_all_us_campgrounds_async(self) -> List[CampgroundRecord]:
+        all_campgrounds: List[CampgroundRecord] = []
+
+        async def collect(tile: Tile, campgrounds: List[CampgroundRecord]) -> None:
+            all_campgrounds.extend(campgrounds)
+
+        with self._exclusive_crawl():
+            async with LocalFrontier(self._us_tiles(), retry_backoff=self.retry_backoff) as frontier:
+                await self._crawl(collect, frontier)
+        return all_campgrounds
+
+    def get_all_us_campgrounds(self) -> List[CampgroundRecord]:
+        return self._run(self.get_all_us_campgrounds_async)
+
+    async def _write_batches(self, queue: asyncio.Queue, batch_size: int, write_mode: str = "upsert",
+                             checkpoint: Optional[CheckpointStore] = None) -> None:
+        """
+        Drain the queue of finished tiles, flushing them to the database in batches until the sentinel arrives.
+
+        Batches are cut at tile boundaries once they reach `batch_size`, and
+        the tiles of a batch are checkpointed as done only after every row in
+        it was committed. In "copy" mode batches are staged with COPY and
+        merged into the live table in one statement once the queue is drained;
+        tiles are checkpointed after the merge.
+        """
+        loader = CopyLoader() if write_mode == "copy" else None
+        staged_tiles: List[Tile] = []
+
+        def flush(tiles: List[Tile], batch: List[CampgroundRecord]) -> None:
+            if loader is not None:
+                self.stage_campgrounds(loader, batch)
+                staged_tiles.extend(tiles)
+                return
+            counts = self.save_campgrounds(batch, batch_size) if batch else {"failed": 0}
+            if checkpoint is not None and not counts["failed"]:
+                checkpoint.mark_done(tiles)
+
+        try:
+            if loader is not None:
+                await asyncio.to_thread(loader.begin)
+            buffer: List[CampgroundRecord] = []
+            tiles: List[Tile] = []
+            while True:
+                item = await queue.get()
+                self.metrics.depth("writer_queue", queue.qsize())
+                if item is None:
+                    break
+                tile, campgrounds = item
+                tiles.append(tile)
+                buffer.extend(campgrounds)
+                if len(buffer) >= batch_size:
+                    await asyncio.to_thread(flush, tiles, buffer)
+                    buffer, tiles = [], []
+            if tiles:
+                await asyncio.to_thread(flush, tiles, buffer)
+            if loader is not None:
+                with self._timed("save"):
+                    merged, ungeocoded = await asyncio.to_thread(loader.merge)
+                self._count_writes(merged)
+                logger.info(f"🗂️ Merged staged campgrounds: {merged}")
+                # Only after the merge, so a backfill running meanwhile finds the campgrounds it geocodes
+                await asyncio.to_thread(self._queue_geocoding, ungeocoded)
+                if checkpoint is not None:
+                    await asyncio.to_thread(checkpoint.mark_done, staged_tiles)
+        finally:
+            if loader is not None:
+                loader.close()
 
+    async def _open_run(self, resume: bool, worker: bool, run_id: Optional[int]) -> CheckpointStore:
+        if resume:
+            checkpoint = await asyncio.to_thread(CheckpointStore.latest_unfinished)
+            if checkpoint is not None:
+                remaining = await asyncio.to_thread(checkpoint.reopen)
+                logger.info(f"⏯️ Resuming scrape run {checkpoint.run_id} with {remaining} tiles left")
+                return checkpoint
+            logger.info("No unfinished scrape run to resume, starting a new one")
+        if worker or run_id is not None:
+            return await asyncio.to_thread(CheckpointStore.join_or_start, self._us_tiles(), run_id)
+        return await asyncio.to_thread(CheckpointStore.start, self._us_tiles())
+
+    @_in_session
+    async def scrape_to_db(self, batch_size: int = 500, queue_size: int = 32, write_mode: str = "upsert",
+                           resume: bool = False, worker: bool = False, run_id: Optional[int] = None) -> Optional[str]:
+        """
+        Scrape and persist concurrently.
+
+        Tiles put their campgrounds on a bounded queue while a single writer
+        flushes them in batches of `batch_size`, so memory stays flat while the
+        scrape is still running. A full queue makes tile workers wait for the
+        writer. With write_mode "upsert" data becomes visible batch by batch;
+        "copy" is the fastest path for full refreshes but publishes everything
+        in a single merge at the end.
+
+        Tiles are claimed from the run's Postgres tile queue, which doubles as
+        a per-tile checkpoint. By default a new run is started; `resume`
+        continues the latest unfinished run, and `worker` (or `run_id`) joins
+        a run that other scraper processes are working on, so that they share
+        its tiles.
+
+        Returns:
+            The run's final status ("completed" or "incomplete"), or None if
+            other workers are still working on it
+
+        Raises:
+            ScraperBusyError: This scraper is already crawling
+        """
+        if write_mode not in WRITE_MODES:
+            raise ValueError(f"Unknown write mode: {write_mode}")
+        if write_mode == "copy" and (worker or run_id is not None):
+            raise ValueError("The copy write mode uses a single staging table and cannot be shared by workers")
+        with self._exclusive_crawl():
+            self.write_stats = {}
+            checkpoint = await self._open_run(resume, worker, run_id)
+
+            frontier = TileQueue(checkpoint, retry_backoff=self.retry_backoff)
+            queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+            async with frontier, asyncio.TaskGroup() as group:
+                writer = group.create_task(self._write_batches(queue, batch_size, write_mode, checkpoint))
+
+                async def produce():
+                    try:
+                        await self._crawl(lambda tile, campgrounds: queue.put((tile, campgrounds)), frontier)
+                    finally:
+                        if not writer.done():
+                            await queue.put(None)
+
+                group.create_task(produce())
+
+            status = await asyncio.to_thread(checkpoint.finish, frontier.owner)
+            logger.info(f"🧾 Write summary: {self.write_stats}")
+            self._log_metrics()
+            return status
+
+    def _log_metrics(self) -> None:
+        logger.info(f"⏱️ Stage timings:\n{self.metrics.summary()}")
+        queues = {name: gauge.snapshot() for name, gauge in self.metrics.gauges.items()}
+        logger.info(f"📊 Queue depths: {queues}")
+        slowest = ", ".join(
+            f"{tile['tile']} ({tile['seconds']:.1f}s, {tile['pages']} pages, {tile['outcome']})"
+            for tile in self.metrics.slowest_tiles()
+        )
+        logger.info(f"🐢 Slowest tiles: {slowest}")
+
+    def dump_metrics(self) -> Optional[str]:
+        """
+        Write the last run's metrics, including the per-tile breakdown, to logs/ as JSON.
+
+        Returns:
+            The path of the file, or None if it couldn't be written
+        """
+        path = os.path.join(LOGS_DIR, f"scrape_metrics_{self.metrics.started_at:%Y%m%d_%H%M%S}.json")
         try:
-            self.db.commit()
-            logger.info(f"🗂️ Saved/updated {count} unique campgrounds")
-        except Exception as e:
-            logger.error(f"❗ Commit failed: {e}")
-            self.db.rollback()
+            os.makedirs(LOGS_DIR, exist_ok=True)
+            self.metrics.dump(path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write run metrics to {path}: {e}")
+            return None
+        logger.info(f"📝 Run metrics written to {path}")
+        return path
+
+    @staticmethod
+    def _campground_row(cg: Union[Campground, CampgroundRecord], now: datetime) -> Dict:
+        if isinstance(cg, Campground):
+            cg = CampgroundRecord.from_campground(cg)
+        row = cg.to_row()
+        row["content_hash"] = content_hash(row)
+        row["created_at"] = now
+        row["updated_at"] = now
+        return row
+
+    def _count_writes(self, counts: Dict[str, int]) -> None:
+        for key, value in counts.items():
+            self.write_stats[key] = self.write_stats.get(key, 0) + value
+            self.campgrounds_written[key] = self.campgrounds_written.get(key, 0) + value
 
-    def run(self) -> None:
+    def save_campgrounds(self, campgrounds: List[Union[Campground, CampgroundRecord]], batch_size: int = 500) -> Dict[str, int]:
+        now = datetime.utcnow()
+        rows = {cg.id: self._campground_row(cg, now) for cg in campgrounds}
+        with self._timed("save"):
+            counts, ungeocoded = upsert_campgrounds(self.db, list(rows.values()), batch_size)
+        self._count_writes(counts)
+        logger.info(f"🗂️ Saved {len(rows)} unique campgrounds: {counts}")
+        self._queue_geocoding(ungeocoded)
+        return counts
+
+    def stage_campgrounds(self, loader: CopyLoader, campgrounds: List[Union[Campground, CampgroundRecord]]) -> None:
+        now = datetime.utcnow()
+        rows = [self._campground_row(cg, now) for cg in campgrounds]
+        with self._timed("save"):
+            count = loader.copy(rows)
+        logger.info(f"📥 Staged {count} campgrounds")
+
+    def _queue_geocoding(self, rows: List[Dict]) -> None:
+        """
+        Queue just-written campgrounds that have no address for the geocoding backfill.
+        """
+        with self._timed("geocode"):
+            queued = enqueue_geocoding(self.db, rows)
+        if queued:
+            self.write_stats["geocode_queued"] = self.write_stats.get("geocode_queued", 0) + queued
+            logger.info(f"🧭 Queued {queued} campgrounds without an address for geocoding")
+
+    def run(self, batch_size: int = 500, write_mode: str = "upsert", resume: bool = False,
+            worker: bool = False, run_id: Optional[int] = None, profile: bool = False) -> None:
+        """
+        Scrape into the database, then write the run's metrics to logs/.
+
+        With `profile`, the run is also profiled with cProfile into logs/.
+        The run's outcome and duration are added to the lifetime counters:
+        "completed", "incomplete", "failed" or, for a worker that finished
+        its share of a shared run, "handed_off". While another run is in
+        progress on this scraper, nothing is started.
+        """
+        if self.running:
+            logger.warning("⏳ A scrape is already running on this scraper, not starting another one")
+            return
         logger.info("🚀 Scraper started")
+        started = time.monotonic()
         try:
-            campgrounds = self.get_all_us_campgrounds()
-            self.save_campgrounds(campgrounds)
+            with profiled("scrape_profile", enabled=profile):
+                status = self._run(lambda: self.scrape_to_db(
+                    batch_size, write_mode=write_mode, resume=resume, worker=worker, run_id=run_id
+                ))
+            outcome = status or "handed_off"
             logger.info("✅ Scraper finished")
         except Exception as err:
+            outcome = "failed"
             logger.error(f"❌ Fatal error: {err}")
+        self.last_run_seconds = time.monotonic() - started
+        self.run_outcomes[outcome] = self.run_outcomes.get(outcome, 0) + 1
+        if outcome == "completed":
+            self.last_success_at = datetime.now(timezone.utc)
+        self.dump_metrics()
 
 
 if __name__ == "__main__":
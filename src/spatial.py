@@ -0,0 +1,106 @@
+"""
+Spatial queries on stored campgrounds, backed by a GiST index on their location.
+"""
+import math
+from typing import List, Tuple
+
+from sqlalchemy import func, literal, text
+from sqlalchemy.orm import Session
+
+from src.database import CampgroundORM
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.195
+
+# Must match the indexed expression of ix_campgrounds_location (see MIGRATIONS) for the index to be used
+LOCATION = func.point(CampgroundORM.longitude, CampgroundORM.latitude)
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """
+    Parse a "west,south,east,north" bounding box, the order The Dyrt's search API uses.
+
+    Raises:
+        ValueError: The box is malformed or outside valid coordinates
+    """
+    try:
+        west, south, east, north = (float(part) for part in value.split(","))
+    except ValueError as e:
+        raise ValueError("bbox must be four numbers: west,south,east,north") from e
+    if not (-180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError("bbox must satisfy -180 <= west <= east <= 180 and -90 <= south <= north <= 90")
+    return west, south, east, north
+
+
+def bbox_around(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Smallest west,south,east,north box containing the circle, clamped to valid coordinates.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    # Longitude degrees shrink towards the poles; near them the box spans every longitude
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    if cos_lat < 1e-6:
+        return -180.0, south, 180.0, north
+    dlon = dlat / cos_lat
+    return max(lon - dlon, -180.0), south, min(lon + dlon, 180.0), north
+
+
+def distance_km(lat: float, lon: float):
+    """
+    SQL expression for the haversine distance from (lat, lon) to each campground, in km.
+    """
+    dlat = func.radians(CampgroundORM.latitude - lat)
+    dlon = func.radians(CampgroundORM.longitude - lon)
+    a = (
+        func.power(func.sin(dlat / 2), 2)
+        + math.cos(math.radians(lat)) * func.cos(func.radians(CampgroundORM.latitude)) * func.power(func.sin(dlon / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, literal(1.0))))
+
+
+def _in_box(west: float, south: float, east: float, north: float):
+    return LOCATION.op("<@")(func.box(func.point(west, south), func.point(east, north)))
+
+
+def campgrounds_in_box(db: Session, columns, bbox: Tuple[float, float, float, float], limit: int) -> List:
+    """
+    Up to `limit` campgrounds inside the box, nearest to its center first.
+
+    Both the containment test and the ordering are answered by the GiST
+    index, so a large box doesn't make the query sort every campground in it.
+    """
+    west, south, east, north = bbox
+    # Postgres has no statistics for `<@` and always guesses a few hundred rows, so it
+    # prefers a bitmap scan plus a sort, which reads the whole box. Only for this transaction.
+    db.execute(text("SET LOCAL enable_bitmapscan = off"))
+    center = func.point((west + east) / 2, (south + north) / 2)
+    return (
+        db.query(*columns)
+        .filter(_in_box(west, south, east, north))
+        # No tie-breaker: anything after the distance would make Postgres sort the whole box again
+        .order_by(LOCATION.op("<->")(center))
+        .limit(limit)
+        .all()
+    )
+
+
+def campgrounds_near(db: Session, columns, lat: float, lon: float, radius_km: float, limit: int) -> List:
+    """
+    Up to `limit` campgrounds within `radius_km` of (lat, lon), nearest first.
+
+    The index narrows the search to the box around the circle; the exact
+    haversine distance is only computed for the campgrounds in that box.
+
+    Returns:
+        Rows of `columns` plus their `distance_km`
+    """
+    distance = distance_km(lat, lon).label("distance_km")
+    return (
+        db.query(*columns, distance)
+        .filter(_in_box(*bbox_around(lat, lon, radius_km)))
+        .filter(distance_km(lat, lon) <= radius_km)
+        .order_by(distance, CampgroundORM.id)
+        .limit(limit)
+        .all()
+    )
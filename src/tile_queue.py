@@ -0,0 +1,179 @@
+"""
+Tile frontiers that feed the scraper's tile workers.
+"""
+import asyncio
+import heapq
+import os
+import socket
+import uuid
+from collections import deque
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from src.checkpoint import CheckpointStore
+from src.tiling import Tile
+
+
+def retry_delay(attempts: int, retry_backoff: float) -> float:
+    """
+    Seconds to wait before retrying a tile that failed `attempts` times.
+    """
+    return retry_backoff * 2 ** (attempts - 1)
+
+
+class LocalFrontier:
+    """
+    In-memory frontier for a single process without checkpoints.
+
+    `get` waits while other workers may still split their tiles into new
+    ones and returns None once every tile has been handed out and finished.
+    A failed tile is deferred: it is handed out again only when no fresh tile
+    is left and its backoff, doubling from `retry_backoff` seconds, has passed.
+    After `max_attempts` attempts it is given up on and kept in `failed`.
+    """
+
+    def __init__(self, tiles: Iterable[Tile], max_attempts: int = 3, retry_backoff: float = 30.0):
+        self._tiles = deque(tiles)
+        self._deferred: List[Tuple[float, int, Tile]] = []
+        self._order = count()
+        self._attempts: Dict[str, int] = {}
+        self._active = 0
+        self._changed = asyncio.Condition()
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.failed: List[Tile] = []
+
+    async def __aenter__(self) -> "LocalFrontier":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def get(self) -> Optional[Tile]:
+        loop = asyncio.get_running_loop()
+        async with self._changed:
+            while not self._tiles:
+                if self._deferred:
+                    delay = self._deferred[0][0] - loop.time()
+                    if delay <= 0:
+                        self._tiles.append(heapq.heappop(self._deferred)[2])
+                        break
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), delay)
+                    except TimeoutError:
+                        pass
+                    continue
+                if not self._active:
+                    return None
+                await self._changed.wait()
+            self._active += 1
+            tile = self._tiles.popleft()
+            self._attempts[tile.key] = self._attempts.get(tile.key, 0) + 1
+            return tile
+
+    def attempts(self, tile: Tile) -> int:
+        """
+        How many times the tile has been handed out.
+        """
+        return self._attempts.get(tile.key, 0)
+
+    async def _finish(self, children: Iterable[Tile] = ()) -> None:
+        async with self._changed:
+            self._tiles.extend(children)
+            self._active -= 1
+            self._changed.notify_all()
+
+    async def split(self, tile: Tile, children: List[Tile]) -> None:
+        await self._finish(children)
+
+    async def fetched(self, tile: Tile) -> None:
+        await self._finish()
+
+    async def fail(self, tile: Tile) -> None:
+        attempts = self.attempts(tile)
+        if attempts >= self.max_attempts:
+            self.failed.append(tile)
+        else:
+            delay = retry_delay(attempts, self.retry_backoff)
+            logger.info(f"⏳ Deferring failed tile {tile.key}, retrying in {delay:.0f}s")
+            heapq.heappush(self._deferred, (asyncio.get_running_loop().time() + delay, next(self._order), tile))
+        await self._finish()
+
+    async def unresolved(self) -> List[Tile]:
+        return list(self.failed)
+
+
+class TileQueue:
+    """
+    Frontier backed by the tiles of a checkpointed run in Postgres.
+
+    Any number of scraper processes can work through the same run: each one
+    claims tiles with `SELECT ... FOR UPDATE SKIP LOCKED`, keeps its leases
+    alive with a heartbeat while it holds them, and stops once no tile is
+    left to claim and no other worker is still scraping one. A failed tile
+    goes back to the queue behind the fresh tiles with a backoff doubling
+    from `retry_backoff` seconds, until it has used up `max_attempts`.
+    """
+
+    def __init__(self, checkpoint: CheckpointStore, lease_seconds: int = 300, max_attempts: int = 3,
+                 poll_interval: float = 2.0, retry_backoff: float = 30.0):
+        self.checkpoint = checkpoint
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self._attempts: Dict[str, int] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "TileQueue":
+        self._heartbeat = asyncio.create_task(self._renew_leases())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._heartbeat.cancel()
+
+    async def _renew_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.checkpoint.renew, self.owner, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not renew tile leases: {e}")
+
+    async def get(self) -> Optional[Tile]:
+        while True:
+            claimed = await asyncio.to_thread(self.checkpoint.claim, self.owner, self.lease_seconds, self.max_attempts)
+            if claimed is not None:
+                tile, attempts = claimed
+                self._attempts[tile.key] = attempts
+                return tile
+            if await asyncio.to_thread(self.checkpoint.is_drained, self.owner, self.max_attempts):
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    def attempts(self, tile: Tile) -> int:
+        """
+        How many times the tile has been claimed, by any worker.
+        """
+        return self._attempts.get(tile.key, 0)
+
+    async def split(self, tile: Tile, children: List[Tile]) -> None:
+        self._attempts.pop(tile.key, None)
+        await asyncio.to_thread(self.checkpoint.mark_split, tile, children)
+
+    async def fetched(self, tile: Tile) -> None:
+        self._attempts.pop(tile.key, None)
+        await asyncio.to_thread(self.checkpoint.mark_fetched, tile)
+
+    async def fail(self, tile: Tile) -> None:
+        attempts = self._attempts.pop(tile.key, 0)
+        delay = retry_delay(attempts, self.retry_backoff) if attempts < self.max_attempts else 0
+        if delay:
+            logger.info(f"⏳ Deferring failed tile {tile.key}, retrying in {delay:.0f}s")
+        await asyncio.to_thread(self.checkpoint.release, tile, delay)
+
+    async def unresolved(self) -> List[Tile]:
+        return await asyncio.to_thread(self.checkpoint.unresolved, self.max_attempts)
@@ -0,0 +1,80 @@
+"""
+Adaptive quadtree tiling of the search area.
+"""
+from dataclasses import dataclass
+from typing import Dict, List
+
+# Bounding box of the contiguous United States
+US_BOUNDS = {"north": 49.38, "south": 24.52, "east": -66.95, "west": -124.77}
+
+
+def owns(bounds: Dict[str, float], lat: float, lon: float) -> bool:
+    """
+    Half-open bounding box test: a box owns its south and west edges but not
+    its north and east ones, so neighbouring tiles never both own a point.
+    """
+    return bounds["south"] <= lat < bounds["north"] and bounds["west"] <= lon < bounds["east"]
+
+
+@dataclass(frozen=True)
+class Tile:
+    """
+    A bounding box in the quadtree, together with its depth.
+    """
+    south: float
+    west: float
+    north: float
+    east: float
+    depth: int = 0
+
+    @classmethod
+    def from_bounds(cls, bounds: Dict[str, float], depth: int = 0) -> "Tile":
+        return cls(bounds["south"], bounds["west"], bounds["north"], bounds["east"], depth)
+
+    @property
+    def bounds(self) -> Dict[str, float]:
+        return {"south": self.south, "north": self.north, "west": self.west, "east": self.east}
+
+    @property
+    def key(self) -> str:
+        return f"{self.west:.5f},{self.south:.5f},{self.east:.5f},{self.north:.5f}"
+
+    def split(self) -> List["Tile"]:
+        """
+        Split the tile into its four quadrants.
+        """
+        mid_lat = (self.south + self.north) / 2
+        mid_lng = (self.west + self.east) / 2
+        depth = self.depth + 1
+        return [
+            Tile(self.south, self.west, mid_lat, mid_lng, depth),
+            Tile(self.south, mid_lng, mid_lat, self.east, depth),
+            Tile(mid_lat, self.west, self.north, mid_lng, depth),
+            Tile(mid_lat, mid_lng, self.north, self.east, depth),
+        ]
+
+
+class AdaptiveTiler:
+    """
+    Decides when a tile is too dense to be scraped as a single unit of work.
+
+    A tile is split once it needs more than `max_pages` result pages, unless it
+    has already reached `max_depth` or its sides are narrower than `min_span`
+    degrees. Sparse tiles are never split, so the resulting work units stay
+    roughly the same size regardless of how skewed the data is.
+    """
+
+    def __init__(self, max_pages: int = 5, max_depth: int = 6, min_span: float = 0.05):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.min_span = min_span
+
+    def can_split(self, tile: Tile) -> bool:
+        return (
+            tile.depth < self.max_depth
+            and (tile.north - tile.south) / 2 >= self.min_span
+            and (tile.east - tile.west) / 2 >= self.min_span
+        )
+
+    def should_split(self, tile: Tile, page_count: int) -> bool:
+        return page_count > self.max_pages and self.can_split(tile)
@@ -55,6 +55,10 @@ def test_api_endpoints(base_url="http://localhost:8000"):
         print(f"Status code: {response.status_code}")
         data = response.json()
         print(f"Found {len(data)} campgrounds")
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor:
+            response = requests.get(f"{base_url}/campgrounds", params={"limit": 5, "cursor": next_cursor})
+            print(f"Next page via cursor: status code {response.status_code}, {len(response.json())} campgrounds")
         
         if len(data) > 0:
             print("\nSample campground:")
@@ -66,6 +70,15 @@ def test_api_endpoints(base_url="http://localhost:8000"):
             response = requests.get(f"{base_url}/campgrounds/{campground_id}")
             print(f"Status code: {response.status_code}")
             print(f"Response: {json.dumps(response.json(), indent=2)}")
+
+            # Test spatial search around the same campground
+            lat, lon = data[0]["latitude"], data[0]["longitude"]
+            print(f"\n6. Testing spatial search around ({lat}, {lon})...")
+            response = requests.get(f"{base_url}/campgrounds/near", params={"lat": lat, "lon": lon, "radius_km": 50, "limit": 5})
+            print(f"Within 50 km: status code {response.status_code}, {len(response.json())} campgrounds")
+            bbox = f"{lon - 0.5},{lat - 0.5},{lon + 0.5},{lat + 0.5}"
+            response = requests.get(f"{base_url}/campgrounds/search", params={"bbox": bbox, "limit": 5})
+            print(f"In bbox {bbox}: status code {response.status_code}, {len(response.json())} campgrounds")
     except Exception as e:
         print(f"Error: {e}")
     
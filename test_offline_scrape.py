@@ -0,0 +1,79 @@
+"""
+Offline scrape test for The Dyrt scraper: scrape the local mock search API, then replay the recorded responses.
+"""
+import argparse
+import sys
+import tempfile
+
+from loguru import logger
+
+from src.fixtures import FixtureStore
+from src.mock_server import SyntheticDataset, start_process
+from src.rate_control import AdaptiveRateController
+from src.scraper import DyrtScraper
+
+def scrape(url, record_dir=None):
+    """
+    Scrape every US tile from `url` without writing to the database and return the campground ids.
+    """
+    scraper = DyrtScraper(
+        search_url=url,
+        record_dir=record_dir,
+        rate_controller=AdaptiveRateController(initial_rate=200, max_rate=200),
+    )
+    return [campground.id for campground in scraper.get_all_us_campgrounds()]
+
+def test_offline_scrape(count=2000, skew=0.5, seed=1):
+    """
+    Scrape a synthetic dataset through the mock server, recording every response, then scrape
+    the recordings again and check that both runs found every campground exactly once.
+
+    Args:
+        count: Number of synthetic campgrounds
+        skew: Share of campgrounds packed into dense hotspots, so that tiles get split
+        seed: Seed of the synthetic dataset
+    """
+    expected = len(SyntheticDataset(hotspot_share=skew, seed=seed, count=count))
+    with tempfile.TemporaryDirectory() as record_dir:
+        print(f"\n1. Scraping {expected} synthetic campgrounds...")
+        server, url = start_process("--count", str(count), "--hotspot-share", str(skew), "--seed", str(seed))
+        try:
+            scraped = scrape(url, record_dir)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"Found {len(scraped)} campgrounds, {len(FixtureStore(record_dir))} responses recorded")
+        assert len(scraped) == expected, f"expected {expected} campgrounds, got {len(scraped)}"
+        assert len(set(scraped)) == len(scraped), "campgrounds were returned more than once"
+
+        print("\n2. Replaying the recorded responses...")
+        server, url = start_process("--fixtures", record_dir)
+        try:
+            replayed = scrape(url)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"Found {len(replayed)} campgrounds")
+        assert sorted(replayed) == sorted(scraped), "the replay found different campgrounds than the recording"
+
+    print("\nOffline scrape test passed!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test the scraper offline against the mock search API")
+    parser.add_argument("--count", type=int, default=2000, help="Number of synthetic campgrounds")
+    parser.add_argument("--skew", type=float, default=0.5, help="Share of campgrounds packed into dense hotspots")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic dataset")
+    parser.add_argument("--log-level", default="WARNING", help="Scraper log level")
+
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    try:
+        test_offline_scrape(count=args.count, skew=args.skew, seed=args.seed)
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nTest interrupted by user")
+        sys.exit(0)